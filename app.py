@@ -4,15 +4,34 @@ Flask backend with Blizzard API integration
 Part of the Hool.gg gaming tools ecosystem
 """
 
+import atexit
+import collections
+import contextlib
+import email.utils
+import functools
+import gzip
+import hashlib
 import json
 import os
+import re
+import sqlite3
 import sys
 import tempfile
+import threading
 import time
+import urllib.parse
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone, date, timedelta
 
 try:
-    from flask import Flask, render_template, jsonify, request
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+try:
+    from flask import Flask, Response, render_template, jsonify, request, g, has_request_context, send_file
     import requests
 except ImportError as e:
     print(f"CRITICAL: Failed to import required modules: {e}", file=sys.stderr)
@@ -30,7 +49,98 @@ app = Flask(__name__,
 
 _data_dir = os.environ.get('HOOL_DATA_DIR', os.path.dirname(__file__))
 os.makedirs(_data_dir, exist_ok=True)
-DATA_FILE = os.path.join(_data_dir, 'data.json')
+
+# Each roster is its own shard. The default roster lives directly in the data
+# directory (data.json as before); named rosters live in rosters/<roster_id>/
+DEFAULT_ROSTER_ID = 'default'
+ROSTERS_DIR = os.path.join(_data_dir, 'rosters')
+ROSTER_ID_PATTERN = re.compile(r'^[a-z0-9][a-z0-9_-]{0,63}$')
+
+# 'json' keeps the whole roster in data.json; 'sqlite' stores per-character rows
+# in roster.db (an existing data.json is imported on first start); 'journal'
+# appends each change to data.journal and folds it into data.json in the background
+STORAGE_BACKEND = os.environ.get('HOOL_STORAGE', 'json').lower()
+
+# Journal compaction triggers: journal size in bytes, or seconds since the last compaction
+JOURNAL_MAX_BYTES = int(os.environ.get('HOOL_JOURNAL_MAX_BYTES', 1024 * 1024))
+JOURNAL_COMPACT_SECONDS = float(os.environ.get('HOOL_JOURNAL_COMPACT_SECONDS', 300))
+
+# Weeks of crest history, weekly tasks and weekly progress kept in the roster
+# document; older weeks move to a per-character compressed archive
+HOT_WEEKS = int(os.environ.get('HOOL_HOT_WEEKS', 4))
+
+# Deduplicated snapshots: one is taken on the first write after this many
+# seconds (0 disables periodic snapshots). Retention keeps the newest
+# HOOL_SNAPSHOT_KEEP, one per day for HOOL_SNAPSHOT_KEEP_DAYS, and every
+# labelled snapshot.
+SNAPSHOT_INTERVAL = float(os.environ.get('HOOL_SNAPSHOT_INTERVAL', 3600))
+SNAPSHOT_KEEP = int(os.environ.get('HOOL_SNAPSHOT_KEEP', 24))
+SNAPSHOT_KEEP_DAYS = int(os.environ.get('HOOL_SNAPSHOT_KEEP_DAYS', 30))
+
+# Group commit: saves within this many seconds of the last write share one
+# write (0 writes synchronously on every save)
+COMMIT_WINDOW = float(os.environ.get('HOOL_COMMIT_WINDOW', 0.25))
+
+# Set when several server processes share one data directory: every load/save
+# cycle then runs under an advisory lock on the roster's data.lock and saves are
+# written before the lock is released (group commit stays per-process)
+MULTIPROCESS = os.environ.get('HOOL_MULTIPROCESS', '').lower() in ('1', 'true', 'yes')
+LOCK_REGION_OFFSET = 1 << 20  # Windows byte-range lock, clear of the generation text
+LOCK_ATTEMPTS = 6  # Windows: LK_LOCK tries for ~10s each before the lock error is raised
+
+# Change events kept per roster so /api/events clients can resume after a reconnect
+CHANGE_FEED_BACKLOG = 512
+
+# Saved revisions remembered per roster so /api/data?since= can answer with a delta
+CHANGE_LOG_SIZE = 1024
+
+# /api/data streams its body instead of building it in one piece from this many characters
+DATA_STREAM_MIN_CHARACTERS = int(os.environ.get('HOOL_DATA_STREAM_MIN_CHARACTERS', 250))
+
+# Characters fetched at once by /api/sync-all (each one is four API calls)
+SYNC_CONCURRENCY = max(1, int(os.environ.get('HOOL_SYNC_CONCURRENCY', 4)))
+
+# Background sync scheduler: API calls it may spend per hour (0, the default, turns it off),
+# minimum age before a character is synced again, what counts as recently
+# active, how far a manual boost moves a character up, and retry backoff
+AUTO_SYNC_BUDGET = int(os.environ.get('HOOL_AUTO_SYNC_BUDGET', 0))
+AUTO_SYNC_MIN_AGE = float(os.environ.get('HOOL_AUTO_SYNC_MIN_AGE', 3600))
+AUTO_SYNC_ACTIVE_SECONDS = 3 * 86400
+AUTO_SYNC_BOOST_SECONDS = 7 * 86400
+AUTO_SYNC_RETRY_BASE = 60
+AUTO_SYNC_RETRY_MAX = 6 * 3600
+AUTO_SYNC_IDLE_SECONDS = 60
+
+# Blizzard API connection pools: hosts kept per region session, and idle
+# keep-alive connections kept per host
+HTTP_POOL_CONNECTIONS = int(os.environ.get('HOOL_HTTP_POOL_CONNECTIONS', 4))
+HTTP_POOL_MAXSIZE = int(os.environ.get('HOOL_HTTP_POOL_MAXSIZE', max(10, SYNC_CONCURRENCY)))
+
+# Client-side Blizzard API quotas per client id (0 disables one). Calls over
+# quota wait up to HOOL_API_MAX_WAIT seconds; 429s are retried after Retry-After.
+API_RATE_PER_SECOND = float(os.environ.get('HOOL_API_RATE_PER_SECOND', 100))
+API_RATE_PER_HOUR = float(os.environ.get('HOOL_API_RATE_PER_HOUR', 36000))
+API_MAX_WAIT = float(os.environ.get('HOOL_API_MAX_WAIT', 120))
+API_MAX_RETRIES = int(os.environ.get('HOOL_API_MAX_RETRIES', 3))
+
+# OAuth tokens are refreshed in the background this many seconds before expiry
+TOKEN_REFRESH_MARGIN = float(os.environ.get('HOOL_TOKEN_REFRESH_MARGIN', 600))
+TOKEN_REFRESH_RETRY = 60  # Seconds between background refresh attempts after one fails
+
+# Server-side item icon cache: entries kept in memory, and how long icon URLs
+# (and "no icon" answers) stay valid in item_media.db
+ICON_CACHE_SIZE = int(os.environ.get('HOOL_ICON_CACHE_SIZE', 4096))
+ICON_CACHE_TTL = float(os.environ.get('HOOL_ICON_CACHE_TTL', 30 * 86400))
+ICON_CACHE_NEGATIVE_TTL = float(os.environ.get('HOOL_ICON_CACHE_NEGATIVE_TTL', 86400))
+
+# POST /api/items/icons: ids accepted per call, and cache misses fetched at once
+ICON_BATCH_MAX = 1000
+ICON_BATCH_CONCURRENCY = max(1, int(os.environ.get('HOOL_ICON_CONCURRENCY', 8)))
+
+# Local image proxy: hosts it may download from (and their subdomains), and
+# the largest image it will store
+IMAGE_PROXY_HOSTS = ('worldofwarcraft.com', 'blizzard.com', 'zamimg.com')
+IMAGE_MAX_BYTES = 2 * 1024 * 1024
 
 # Blizzard API slot mapping
 SLOT_MAP = {
@@ -264,33 +374,23 @@ def init_default_data():
     return {
         "meta": {
             "current_week": 0,
+            "schema_version": SCHEMA_VERSION,
             "last_updated": datetime.now(timezone.utc).isoformat().replace('+00:00', 'Z')
         },
         "blizzard_config": {
             "use_shared_credentials": True,
             "client_id": "",
             "client_secret": "",
-            "region": "us",
-            "access_token": "",
-            "token_expires": None
+            "region": "us"
         },
         "characters": []
     }
 
-def load_data():
-    """Load data from JSON file, creating default if it doesn't exist."""
-    # Initialize with default data if file doesn't exist
-    if not os.path.exists(DATA_FILE):
-        default_data = init_default_data()
-        save_data(default_data)
-        return default_data
-
-    with open(DATA_FILE, 'r') as f:
-        data = json.load(f)
 
+def migrate_crest_history(data):
+    """Backfill crest structures and weekly_history, then rebuild derived totals."""
     current_week = str(data['meta'].get('current_week', 0))
 
-    # Migrate/validate data structure
     for char in data.get('characters', []):
         # Ensure crests structure exists
         if 'crests' not in char:
@@ -316,11 +416,13 @@ def load_data():
             if crest_data['weekly_history']:
                 crest_data['total_collected'] = sum(crest_data['weekly_history'].values())
 
-        # Ensure profession_progress exists
+
+def migrate_gear_fields(data):
+    """Ensure profession_progress exists and gear slots have all required fields."""
+    for char in data.get('characters', []):
         if 'profession_progress' not in char:
             char['profession_progress'] = init_profession_progress(char.get('professions', []))
 
-        # Ensure gear slots have all required fields
         for slot_name, slot_data in char.get('gear', {}).items():
             if 'item_id' not in slot_data:
                 slot_data['item_id'] = 0
@@ -331,7 +433,10 @@ def load_data():
             if 'enchanted' not in slot_data:
                 slot_data['enchanted'] = False
 
-        # Ensure task structures exist
+
+def migrate_task_keys(data):
+    """Ensure task structures exist and weekly_tasks is keyed by week string."""
+    for char in data.get('characters', []):
         if 'weekly_tasks' not in char:
             char['weekly_tasks'] = {}
         if 'daily_tasks' not in char:
@@ -344,23 +449,25 @@ def load_data():
                 new_weekly_tasks[str(week_key)] = tasks
             char['weekly_tasks'] = new_weekly_tasks
 
-        # Ensure avatar and stats exist
+
+def migrate_profile_fields(data):
+    """Ensure avatar, stats, class, level and order fields exist."""
+    for char in data.get('characters', []):
         if 'avatar_url' not in char:
             char['avatar_url'] = None
         if 'stats' not in char:
             char['stats'] = {}
-
-        # Ensure class and level exist
         if 'class' not in char:
             char['class'] = ''
         if 'level' not in char:
             char['level'] = 0
-
-        # Ensure order field exists
         if 'order' not in char:
             char['order'] = char['id']  # Default to ID order
 
-        # Ensure new fields for dashboard redesign
+
+def migrate_dashboard_fields(data):
+    """Ensure fields added for the dashboard redesign exist."""
+    for char in data.get('characters', []):
         if 'weekly_progress' not in char:
             char['weekly_progress'] = {}
         if 'bis_list' not in char:
@@ -368,26 +475,1523 @@ def load_data():
         if 'talent_builds' not in char:
             char['talent_builds'] = []
 
-    # Sort characters by order field
-    data['characters'].sort(key=lambda c: c.get('order', c['id']))
 
-    return data
+def migrate_token_fields(data):
+    """Drop OAuth tokens from blizzard_config; they now live in token_cache.json."""
+    config = data.get('blizzard_config', {})
+    config.pop('access_token', None)
+    config.pop('token_expires', None)
+
+
+# Ordered schema migrations: (version, step). Each step runs once per data file,
+# when meta.schema_version is below its version, and the result is saved.
+# Append new steps here; never renumber or reorder existing ones.
+MIGRATIONS = [
+    (1, migrate_crest_history),
+    (2, migrate_gear_fields),
+    (3, migrate_task_keys),
+    (4, migrate_profile_fields),
+    (5, migrate_dashboard_fields),
+    (6, migrate_token_fields),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def apply_migrations(data):
+    """Run pending migration steps in order. Returns True if any step ran."""
+    version = data['meta'].get('schema_version', 0)
+    pending = [(v, step) for v, step in MIGRATIONS if v > version]
+
+    for v, step in pending:
+        step(data)
+        data['meta']['schema_version'] = v
 
+    return bool(pending)
+
+
+# Storage backends
+#
+# A backend persists the roster dict. save() receives `changes`, the list of
+# (char_id, section) pairs a route touched: section is a top-level character
+# key, None for the whole character (or its deletion if the id is gone), and
+# char_id None marks roster-level keys such as blizzard_config. changes=None
+# means "everything". Backends may use it to write less; JsonStorage ignores it.
+
+class JsonStorage:
+    """Whole roster in a single data.json file. The default, fine for small installs."""
+
+    name = 'json'
+
+    def __init__(self, path):
+        self.path = path
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def signature(self):
+        """Return (mtime_ns, size) of the file, or None if it doesn't exist."""
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def load(self):
+        with open(self.path, 'r') as f:
+            return json.load(f)
+
+    def save(self, data, changes=None):
+        """Atomic save to JSON file using temp file + rename."""
+        # Write to temp file first
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(self.path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(data, f, indent=2)
+            # Atomic rename
+            os.replace(temp_path, self.path)
+        except:
+            os.unlink(temp_path)
+            raise
+
+
+class SqliteStorage:
+    """Roster in SQLite with per-character rows, so a save rewrites only the sections it touched."""
+
+    name = 'sqlite'
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS roster (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS characters (
+            id INTEGER PRIMARY KEY,
+            sort_order INTEGER,
+            name TEXT,
+            realm TEXT,
+            character_name TEXT,
+            class TEXT,
+            level INTEGER,
+            avatar_url TEXT,
+            last_gear_sync TEXT,
+            avg_ilvl REAL,
+            extra TEXT NOT NULL DEFAULT '{}'
+        );
+        CREATE TABLE IF NOT EXISTS gear_slots (
+            char_id INTEGER NOT NULL,
+            slot TEXT NOT NULL,
+            position INTEGER NOT NULL,
+            ilvl INTEGER,
+            track TEXT,
+            item_name TEXT,
+            item_id INTEGER,
+            quality TEXT,
+            sockets INTEGER,
+            enchanted INTEGER,
+            icon_id INTEGER,
+            PRIMARY KEY (char_id, slot)
+        );
+        CREATE TABLE IF NOT EXISTS crests (
+            char_id INTEGER NOT NULL,
+            crest_type TEXT NOT NULL,
+            position INTEGER NOT NULL,
+            collected_this_week INTEGER,
+            total_collected INTEGER,
+            archived_total INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (char_id, crest_type)
+        );
+        CREATE TABLE IF NOT EXISTS crest_history (
+            char_id INTEGER NOT NULL,
+            crest_type TEXT NOT NULL,
+            week TEXT NOT NULL,
+            amount INTEGER NOT NULL,
+            PRIMARY KEY (char_id, crest_type, week)
+        );
+        CREATE TABLE IF NOT EXISTS weekly_progress (
+            char_id INTEGER NOT NULL,
+            week TEXT NOT NULL,
+            progress TEXT NOT NULL,
+            PRIMARY KEY (char_id, week)
+        );
+        CREATE TABLE IF NOT EXISTS bis_items (
+            char_id INTEGER NOT NULL,
+            id INTEGER NOT NULL,
+            position INTEGER NOT NULL,
+            slot TEXT,
+            item_name TEXT,
+            item_id INTEGER,
+            target_ilvl INTEGER,
+            obtained INTEGER,
+            synced INTEGER,
+            PRIMARY KEY (char_id, id)
+        );
+        CREATE TABLE IF NOT EXISTS talent_builds (
+            char_id INTEGER NOT NULL,
+            id INTEGER NOT NULL,
+            position INTEGER NOT NULL,
+            category TEXT,
+            name TEXT,
+            description TEXT,
+            talent_string TEXT,
+            PRIMARY KEY (char_id, id)
+        );
+    """
+
+    # Character keys stored as columns of the characters table (key -> column).
+    # Everything else that has no table of its own goes into characters.extra.
+    CHARACTER_COLUMNS = {
+        'order': 'sort_order',
+        'name': 'name',
+        'realm': 'realm',
+        'character_name': 'character_name',
+        'class': 'class',
+        'level': 'level',
+        'avatar_url': 'avatar_url',
+        'last_gear_sync': 'last_gear_sync',
+        'avg_ilvl': 'avg_ilvl',
+    }
+    GEAR_COLUMNS = ('ilvl', 'track', 'item_name', 'item_id', 'quality', 'sockets', 'enchanted', 'icon_id')
+    BIS_COLUMNS = ('id', 'slot', 'item_name', 'item_id', 'target_ilvl', 'obtained', 'synced')
+    TALENT_COLUMNS = ('id', 'category', 'name', 'description', 'talent_string')
+    CHILD_TABLES = ('gear_slots', 'crests', 'crest_history', 'weekly_progress', 'bis_items', 'talent_builds')
+
+    def __init__(self, path):
+        self.path = path
+        # One shared connection; every call happens under the roster's lock
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.executescript(self.SCHEMA)
+        # Databases created before week archiving lack the archived_total column
+        crest_columns = [row[1] for row in self.conn.execute('PRAGMA table_info(crests)')]
+        if 'archived_total' not in crest_columns:
+            self.conn.execute('ALTER TABLE crests ADD COLUMN archived_total INTEGER NOT NULL DEFAULT 0')
+        self.section_writers = {
+            'gear': self._write_gear,
+            'crests': self._write_crests,
+            'weekly_progress': self._write_weekly_progress,
+            'bis_list': self._write_bis_list,
+            'talent_builds': self._write_talent_builds,
+        }
+
+    def exists(self):
+        return self.conn.execute("SELECT 1 FROM roster WHERE key = 'meta'").fetchone() is not None
+
+    def signature(self):
+        """Changes whenever another connection (process, external tool) commits."""
+        return self.conn.execute('PRAGMA data_version').fetchone()[0]
+
+    def load(self):
+        data = {key: json.loads(value) for key, value in self.conn.execute('SELECT key, value FROM roster')}
+
+        columns = list(self.CHARACTER_COLUMNS.items())
+        chars = {}
+        rows = self.conn.execute(
+            f"SELECT id, {', '.join(col for _, col in columns)}, extra FROM characters ORDER BY sort_order, id")
+        for row in rows:
+            char = {'id': row[0]}
+            for (key, _), value in zip(columns, row[1:-1]):
+                char[key] = value
+            char.update(json.loads(row[-1]))
+            char.update({'gear': {}, 'crests': {}, 'weekly_progress': {}, 'bis_list': [], 'talent_builds': []})
+            chars[char['id']] = char
+
+        rows = self.conn.execute(
+            f"SELECT char_id, slot, {', '.join(self.GEAR_COLUMNS)} FROM gear_slots ORDER BY char_id, position")
+        for char_id, slot, *values in rows:
+            slot_data = {k: v for k, v in zip(self.GEAR_COLUMNS, values) if v is not None}
+            if 'enchanted' in slot_data:
+                slot_data['enchanted'] = bool(slot_data['enchanted'])
+            chars[char_id]['gear'][slot] = slot_data
+
+        rows = self.conn.execute(
+            'SELECT char_id, crest_type, collected_this_week, total_collected, archived_total '
+            'FROM crests ORDER BY char_id, position')
+        for char_id, crest_type, this_week, total, archived in rows:
+            chars[char_id]['crests'][crest_type] = {
+                'collected_this_week': this_week,
+                'total_collected': total,
+                'weekly_history': {}
+            }
+            if archived:
+                chars[char_id]['crests'][crest_type]['archived_total'] = archived
+        rows = self.conn.execute('SELECT char_id, crest_type, week, amount FROM crest_history ORDER BY rowid')
+        for char_id, crest_type, week, amount in rows:
+            chars[char_id]['crests'][crest_type]['weekly_history'][week] = amount
+
+        for char_id, week, progress in self.conn.execute(
+                'SELECT char_id, week, progress FROM weekly_progress ORDER BY rowid'):
+            chars[char_id]['weekly_progress'][week] = json.loads(progress)
+
+        rows = self.conn.execute(
+            f"SELECT char_id, {', '.join(self.BIS_COLUMNS)} FROM bis_items ORDER BY char_id, position")
+        for char_id, *values in rows:
+            item = dict(zip(self.BIS_COLUMNS, values))
+            item['obtained'] = bool(item['obtained'])
+            item['synced'] = bool(item['synced'])
+            chars[char_id]['bis_list'].append(item)
+
+        rows = self.conn.execute(
+            f"SELECT char_id, {', '.join(self.TALENT_COLUMNS)} FROM talent_builds ORDER BY char_id, position")
+        for char_id, *values in rows:
+            chars[char_id]['talent_builds'].append(dict(zip(self.TALENT_COLUMNS, values)))
+
+        data['characters'] = list(chars.values())
+        return data
+
+    def save(self, data, changes=None):
+        """Write roster-level keys, then only the character rows named in `changes`."""
+        with self.conn:
+            for key, value in data.items():
+                if key != 'characters':
+                    self.conn.execute('INSERT OR REPLACE INTO roster (key, value) VALUES (?, ?)',
+                                      (key, json.dumps(value)))
+
+            by_id = {char['id']: char for char in data['characters']}
+
+            if changes is None:
+                stored_ids = [row[0] for row in self.conn.execute('SELECT id FROM characters')]
+                for char_id in stored_ids:
+                    if char_id not in by_id:
+                        self._delete_character(char_id)
+                for char in data['characters']:
+                    self._write_character(char)
+                return
+
+            written = set()
+            for char_id, section in changes:
+                if char_id is None:
+                    continue  # Roster-level keys were written above
+                char = by_id.get(char_id)
+                if char is None:
+                    key = (char_id, None)
+                    if key not in written:
+                        self._delete_character(char_id)
+                elif section is None:
+                    key = (char_id, None)
+                    if key not in written:
+                        self._write_character(char)
+                else:
+                    # Sections without a table of their own all live in the characters row
+                    key = (char_id, section if section in self.section_writers else 'characters')
+                    if key not in written and (char_id, None) not in written:
+                        self.section_writers.get(section, self._write_character_row)(char)
+                written.add(key)
+
+    def _delete_character(self, char_id):
+        self.conn.execute('DELETE FROM characters WHERE id = ?', (char_id,))
+        for table in self.CHILD_TABLES:
+            self.conn.execute(f'DELETE FROM {table} WHERE char_id = ?', (char_id,))
+
+    def _write_character(self, char):
+        self._write_character_row(char)
+        for writer in self.section_writers.values():
+            writer(char)
+
+    def _write_character_row(self, char):
+        columns = list(self.CHARACTER_COLUMNS.items())
+        extra = {k: v for k, v in char.items()
+                 if k != 'id' and k not in self.CHARACTER_COLUMNS and k not in self.section_writers}
+        self.conn.execute(
+            f"INSERT OR REPLACE INTO characters (id, {', '.join(col for _, col in columns)}, extra) "
+            f"VALUES ({', '.join('?' * (len(columns) + 2))})",
+            (char['id'], *(char.get(key) for key, _ in columns), json.dumps(extra)))
+
+    def _write_gear(self, char):
+        self.conn.execute('DELETE FROM gear_slots WHERE char_id = ?', (char['id'],))
+        self.conn.executemany(
+            f"INSERT INTO gear_slots (char_id, slot, position, {', '.join(self.GEAR_COLUMNS)}) "
+            f"VALUES ({', '.join('?' * (len(self.GEAR_COLUMNS) + 3))})",
+            [(char['id'], slot, position, *(slot_data.get(k) for k in self.GEAR_COLUMNS))
+             for position, (slot, slot_data) in enumerate(char.get('gear', {}).items())])
+
+    def _write_crests(self, char):
+        self.conn.execute('DELETE FROM crests WHERE char_id = ?', (char['id'],))
+        self.conn.execute('DELETE FROM crest_history WHERE char_id = ?', (char['id'],))
+        for position, (crest_type, crest_data) in enumerate(char.get('crests', {}).items()):
+            self.conn.execute(
+                'INSERT INTO crests (char_id, crest_type, position, collected_this_week, total_collected, archived_total) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (char['id'], crest_type, position, crest_data.get('collected_this_week', 0),
+                 crest_data.get('total_collected', 0), crest_data.get('archived_total', 0)))
+            self.conn.executemany(
+                'INSERT INTO crest_history (char_id, crest_type, week, amount) VALUES (?, ?, ?, ?)',
+                [(char['id'], crest_type, str(week), amount)
+                 for week, amount in crest_data.get('weekly_history', {}).items()])
+
+    def _write_weekly_progress(self, char):
+        self.conn.execute('DELETE FROM weekly_progress WHERE char_id = ?', (char['id'],))
+        self.conn.executemany(
+            'INSERT INTO weekly_progress (char_id, week, progress) VALUES (?, ?, ?)',
+            [(char['id'], str(week), json.dumps(progress))
+             for week, progress in char.get('weekly_progress', {}).items()])
+
+    def _write_bis_list(self, char):
+        self.conn.execute('DELETE FROM bis_items WHERE char_id = ?', (char['id'],))
+        self.conn.executemany(
+            f"INSERT INTO bis_items (char_id, position, {', '.join(self.BIS_COLUMNS)}) "
+            f"VALUES ({', '.join('?' * (len(self.BIS_COLUMNS) + 2))})",
+            [(char['id'], position, *(item.get(k) for k in self.BIS_COLUMNS))
+             for position, item in enumerate(char.get('bis_list', []))])
+
+    def _write_talent_builds(self, char):
+        self.conn.execute('DELETE FROM talent_builds WHERE char_id = ?', (char['id'],))
+        self.conn.executemany(
+            f"INSERT INTO talent_builds (char_id, position, {', '.join(self.TALENT_COLUMNS)}) "
+            f"VALUES ({', '.join('?' * (len(self.TALENT_COLUMNS) + 2))})",
+            [(char['id'], position, *(build.get(k) for k in self.TALENT_COLUMNS))
+             for position, build in enumerate(char.get('talent_builds', []))])
+
+
+class JournalStorage(JsonStorage):
+    """data.json snapshot plus an append-only journal of per-section changes.
+
+    A save appends one JSON line with the new value of every section it
+    touched; the snapshot is only rewritten by compact(). Loading replays
+    journal entries newer than the snapshot's meta.journal_seq.
+    """
+
+    name = 'journal'
+
+    def __init__(self, path, journal_path):
+        super().__init__(path)
+        self.journal_path = journal_path
+        self.seq = 0
+        self.last_compacted = time.time()
+
+    def signature(self):
+        snapshot = super().signature()
+        if snapshot is None:
+            return None
+        try:
+            st = os.stat(self.journal_path)
+        except FileNotFoundError:
+            return snapshot
+        return snapshot + (st.st_mtime_ns, st.st_size)
+
+    def load(self):
+        data = super().load()
+        self.seq = data['meta'].get('journal_seq', 0)
+        for entry in self._read_journal():
+            # Entries at or below journal_seq are already in the snapshot
+            if entry['seq'] > self.seq:
+                for op in entry['ops']:
+                    self._apply(data, op)
+                self.seq = entry['seq']
+        return data
+
+    def _read_journal(self):
+        """Parse journal lines, cutting off a torn final write left by a crash."""
+        try:
+            f = open(self.journal_path, 'rb+')
+        except FileNotFoundError:
+            return []
+
+        entries = []
+        good_offset = 0
+        with f:
+            for line in f:
+                try:
+                    if not line.endswith(b'\n'):
+                        raise ValueError('incomplete line')
+                    entries.append(json.loads(line))
+                except ValueError:
+                    print(f"Journal: discarding torn entry at byte {good_offset}", file=sys.stderr)
+                    f.truncate(good_offset)
+                    break
+                good_offset += len(line)
+        return entries
+
+    @staticmethod
+    def _apply(data, op):
+        if op['char_id'] is None:
+            data[op['section']] = op['value']
+            return
+
+        chars = data['characters']
+        index = next((i for i, c in enumerate(chars) if c['id'] == op['char_id']), None)
+        if op['op'] == 'delete':
+            if index is not None:
+                del chars[index]
+        elif op['op'] == 'put':
+            if index is None:
+                chars.append(op['value'])
+            else:
+                chars[index] = op['value']
+        elif index is not None:
+            chars[index][op['section']] = op['value']
+
+    def save(self, data, changes=None):
+        if changes is None or not self.exists():
+            self.compact(data)
+            return
+
+        by_id = {char['id']: char for char in data['characters']}
+        ops = [{'op': 'set', 'char_id': None, 'section': 'meta', 'value': data['meta']}]
+        seen = {(None, 'meta')}
+        for char_id, section in changes:
+            if (char_id, section) in seen:
+                continue
+            seen.add((char_id, section))
+
+            char = by_id.get(char_id)
+            if char_id is None:
+                ops.append({'op': 'set', 'char_id': None, 'section': section, 'value': data.get(section)})
+            elif char is None:
+                ops.append({'op': 'delete', 'char_id': char_id})
+            elif section is None:
+                ops.append({'op': 'put', 'char_id': char_id, 'value': char})
+            else:
+                ops.append({'op': 'set', 'char_id': char_id, 'section': section, 'value': char.get(section)})
+
+        self.seq += 1
+        line = json.dumps({'seq': self.seq, 'ops': ops}) + '\n'
+        with open(self.journal_path, 'a') as f:
+            f.write(line)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def journal_size(self):
+        try:
+            return os.path.getsize(self.journal_path)
+        except FileNotFoundError:
+            return 0
 
-def save_data(data):
-    """Atomic save to JSON file using temp file + rename."""
-    data['meta']['last_updated'] = datetime.now(timezone.utc).isoformat().replace('+00:00', 'Z')
+    def needs_compaction(self):
+        size = self.journal_size()
+        if size >= JOURNAL_MAX_BYTES:
+            return True
+        return size > 0 and time.time() - self.last_compacted >= JOURNAL_COMPACT_SECONDS
 
-    # Write to temp file first
-    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(DATA_FILE), suffix='.tmp')
+    def compact(self, data):
+        """Rewrite the snapshot from `data` and empty the journal."""
+        data['meta']['journal_seq'] = self.seq
+        super().save(data)
+        # A crash before this truncate is harmless: replay skips seq <= journal_seq
+        open(self.journal_path, 'w').close()
+        self.last_compacted = time.time()
+
+
+# Hot/cold tiering of per-week history
+#
+# Weeks older than HOT_WEEKS before the current week move out of the roster
+# document into a gzip file per character. Crests keep `archived_total`, the
+# sum of weeks not in the hot document, so total_collected stays correct.
+# Restoring a week copies it back without touching the archive file, so a
+# crash between the two writes can never drop a week; the hot copy wins.
+
+WEEKLY_SECTIONS = ('weekly_tasks', 'weekly_progress')
+
+
+class WeekArchive:
+    """Compressed per-character store of cold weeks (archive/<char_id>.json.gz)."""
+
+    def __init__(self, directory):
+        self.directory = os.path.join(directory, 'archive')
+
+    def path(self, char_id):
+        return os.path.join(self.directory, f'{char_id}.json.gz')
+
+    def read(self, char_id):
+        try:
+            with gzip.open(self.path(char_id), 'rt') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {'crests': {}, 'weekly_tasks': {}, 'weekly_progress': {}}
+
+    def write(self, char_id, archive):
+        os.makedirs(self.directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with gzip.open(os.fdopen(fd, 'wb'), 'wt') as f:
+                json.dump(archive, f)
+            os.replace(temp_path, self.path(char_id))
+        except:
+            os.unlink(temp_path)
+            raise
+
+    def delete(self, char_id):
+        try:
+            os.unlink(self.path(char_id))
+        except FileNotFoundError:
+            pass
+
+    def ids(self):
+        """Character ids that have an archive file."""
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        return [int(name.split('.', 1)[0]) for name in names
+                if name.endswith('.json.gz') and name.split('.', 1)[0].isdigit()]
+
+
+def _is_cold(week_key, cutoff):
     try:
-        with os.fdopen(fd, 'w') as f:
-            json.dump(data, f, indent=2)
-        # Atomic rename
-        os.replace(temp_path, DATA_FILE)
-    except:
-        os.unlink(temp_path)
-        raise
+        return int(week_key) < cutoff
+    except (TypeError, ValueError):
+        return False
+
+
+def archive_cold_weeks(archive_store, data):
+    """Move weeks older than the hot horizon into the archive. Returns the (char_id, section) changes."""
+    # Use the earlier of the stored and calendar week so neither view loses its week
+    region = data.get('blizzard_config', {}).get('region', 'us')
+    reference = min(int(data['meta'].get('current_week', 0)), calculate_current_week(region))
+    cutoff = reference - HOT_WEEKS
+    if cutoff <= 0:
+        return []
+
+    changes = []
+    for char in data['characters']:
+        cold_crests = {
+            crest_type: [w for w in crest_data.get('weekly_history', {}) if _is_cold(w, cutoff)]
+            for crest_type, crest_data in char.get('crests', {}).items()
+        }
+        cold_sections = {section: [w for w in char.get(section, {}) if _is_cold(w, cutoff)]
+                         for section in WEEKLY_SECTIONS}
+        if not any(cold_crests.values()) and not any(cold_sections.values()):
+            continue
+
+        archive = archive_store.read(char['id'])
+        for crest_type, weeks in cold_crests.items():
+            if not weeks:
+                continue
+            crest_data = char['crests'][crest_type]
+            archived = archive['crests'].setdefault(crest_type, {})
+            for week in weeks:
+                amount = crest_data['weekly_history'].pop(week)
+                archived[week] = amount
+                crest_data['archived_total'] = crest_data.get('archived_total', 0) + amount
+            changes.append((char['id'], 'crests'))
+        for section, weeks in cold_sections.items():
+            for week in weeks:
+                archive[section][week] = char[section].pop(week)
+            if weeks:
+                changes.append((char['id'], section))
+
+        archive_store.write(char['id'], archive)
+
+    return changes
+
+
+def restore_archived_week(archive_store, char, week):
+    """Bring one archived week back into the hot document (e.g. when navigating back to it)."""
+    week = str(week)
+    archive = archive_store.read(char['id'])
+    changes = []
+
+    for crest_type, archived in archive['crests'].items():
+        crests = char.get('crests', {})
+        if week in archived and crest_type in crests and week not in crests[crest_type].get('weekly_history', {}):
+            amount = archived[week]
+            crest_data = char['crests'][crest_type]
+            crest_data.setdefault('weekly_history', {})[week] = amount
+            crest_data['archived_total'] = crest_data.get('archived_total', 0) - amount
+            changes.append((char['id'], 'crests'))
+    for section in WEEKLY_SECTIONS:
+        if week in archive[section] and week not in char.get(section, {}):
+            char.setdefault(section, {})[week] = archive[section][week]
+            changes.append((char['id'], section))
+
+    return changes
+
+
+def merge_week_history(archive_store, char):
+    """Full per-week history for a character: archived weeks plus the hot ones."""
+    archive = archive_store.read(char['id'])
+
+    crests = {}
+    for crest_type, crest_data in char.get('crests', {}).items():
+        crests[crest_type] = {**archive['crests'].get(crest_type, {}), **crest_data.get('weekly_history', {})}
+    history = {'crests': crests}
+    for section in WEEKLY_SECTIONS:
+        history[section] = {**archive[section], **char.get(section, {})}
+    return history
+
+
+# Deduplicated roster snapshots
+#
+# A snapshot is a small manifest listing content hashes: one chunk for the
+# roster-level keys, one per character, and one per character's cold-week
+# archive (which lives outside the roster document). Chunks are gzip JSON files named by
+# the SHA-256 of their canonical serialization, so a character that did not
+# change since the last snapshot costs nothing but its hash in the manifest.
+
+
+class SnapshotStore:
+    """Point-in-time roster versions under <roster dir>/snapshots."""
+
+    def __init__(self, directory, archive):
+        self.archive = archive
+        self.directory = os.path.join(directory, 'snapshots')
+        self.chunks_dir = os.path.join(self.directory, 'chunks')
+        self.manifests_dir = os.path.join(self.directory, 'manifests')
+        self.last_created = None
+
+    def _chunk_path(self, digest):
+        return os.path.join(self.chunks_dir, digest[:2], f'{digest}.json.gz')
+
+    def _manifest_path(self, snapshot_id):
+        # Ids come from URLs; anything but the generated format could escape the directory
+        if not re.fullmatch(r'\d{8}T\d{12}Z', snapshot_id):
+            raise ValueError(f"Invalid snapshot id: {snapshot_id!r}")
+        return os.path.join(self.manifests_dir, f'{snapshot_id}.json')
+
+    @staticmethod
+    def _write_atomic(path, payload, compress=False):
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(gzip.compress(payload) if compress else payload)
+            os.replace(temp_path, path)
+        except:
+            os.unlink(temp_path)
+            raise
+
+    def _put_chunk(self, value):
+        """Store one chunk unless an identical one exists; return (digest, bytes written)."""
+        payload = json.dumps(value, sort_keys=True, separators=(',', ':')).encode()
+        digest = hashlib.sha256(payload).hexdigest()
+        path = self._chunk_path(digest)
+        if os.path.exists(path):
+            return digest, 0
+        self._write_atomic(path, payload, compress=True)
+        return digest, os.path.getsize(path)
+
+    def _get_chunk(self, digest):
+        with gzip.open(self._chunk_path(digest), 'rt') as f:
+            return json.load(f)
+
+    def create(self, data, label=None):
+        """Record the current roster; only chunks not already stored are written."""
+        roster_keys = {key: value for key, value in data.items() if key != 'characters'}
+        roster_digest, new_bytes = self._put_chunk(roster_keys)
+        char_digests = []
+        archive_digests = {}
+        for char in data['characters']:
+            digest, written = self._put_chunk(char)
+            char_digests.append(digest)
+            new_bytes += written
+
+            if os.path.exists(self.archive.path(char['id'])):
+                digest, written = self._put_chunk(self.archive.read(char['id']))
+                archive_digests[str(char['id'])] = digest
+                new_bytes += written
+
+        now = datetime.now(timezone.utc)
+        manifest = {
+            'id': now.strftime('%Y%m%dT%H%M%S%fZ'),
+            'created': now.isoformat().replace('+00:00', 'Z'),
+            'label': label,
+            'roster': roster_digest,
+            'characters': char_digests,
+            'archives': archive_digests,
+            'new_bytes': new_bytes,
+        }
+        self._write_atomic(self._manifest_path(manifest['id']), json.dumps(manifest).encode())
+        self.last_created = time.time()
+        self.prune()
+        return manifest
+
+    def list(self):
+        """Manifests, newest first."""
+        try:
+            names = os.listdir(self.manifests_dir)
+        except FileNotFoundError:
+            return []
+
+        manifests = []
+        for name in sorted(names, reverse=True):
+            if not name.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(self.manifests_dir, name), 'r') as f:
+                    manifests.append(json.load(f))
+            except (OSError, ValueError) as e:
+                print(f"Snapshots: skipping unreadable manifest {name}: {e}", file=sys.stderr)
+        return manifests
+
+    def get(self, snapshot_id):
+        try:
+            with open(self._manifest_path(snapshot_id), 'r') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def load(self, manifest):
+        """Rebuild the roster recorded by a manifest."""
+        data = self._get_chunk(manifest['roster'])
+        data['characters'] = [self._get_chunk(digest) for digest in manifest['characters']]
+        return data
+
+    def restore_archives(self, manifest, data):
+        """Put back the cold-week archives recorded with the manifest's characters.
+
+        Archives of characters the snapshot doesn't have, or had none for,
+        are removed. Manifests from before archives were recorded leave the
+        archive directory alone.
+        """
+        if 'archives' not in manifest:
+            return
+        keep = {str(char['id']) for char in data['characters']}
+        for char_id in keep:
+            digest = manifest['archives'].get(char_id)
+            if digest:
+                self.archive.write(int(char_id), self._get_chunk(digest))
+            else:
+                self.archive.delete(int(char_id))
+        for char_id in self.archive.ids():
+            if str(char_id) not in keep:
+                self.archive.delete(char_id)
+
+    def is_due(self):
+        """Whether the periodic snapshot interval has elapsed."""
+        if SNAPSHOT_INTERVAL <= 0:
+            return False
+        if self.last_created is None:
+            newest = next(iter(self.list()), None)
+            self.last_created = (datetime.fromisoformat(newest['created'].replace('Z', '+00:00')).timestamp()
+                                 if newest else 0)
+        return time.time() - self.last_created >= SNAPSHOT_INTERVAL
+
+    def delete(self, snapshot_id):
+        os.unlink(self._manifest_path(snapshot_id))
+        self.collect_garbage()
+
+    def prune(self):
+        """Apply retention: keep labelled snapshots, the SNAPSHOT_KEEP newest,
+        and the newest snapshot of each of the last SNAPSHOT_KEEP_DAYS days.
+        """
+        days = set()
+        dropped = False
+        for index, manifest in enumerate(self.list()):
+            day = manifest['created'][:10]
+            if manifest.get('label') or index < SNAPSHOT_KEEP:
+                pass
+            elif day not in days and len(days) < SNAPSHOT_KEEP_DAYS:
+                pass
+            else:
+                os.unlink(self._manifest_path(manifest['id']))
+                dropped = True
+            days.add(day)
+
+        if dropped:
+            self.collect_garbage()
+
+    def collect_garbage(self):
+        """Delete chunks that no remaining manifest references."""
+        referenced = set()
+        for manifest in self.list():
+            referenced.add(manifest['roster'])
+            referenced.update(manifest['characters'])
+            referenced.update(manifest.get('archives', {}).values())
+
+        for root, _, files in os.walk(self.chunks_dir):
+            for name in files:
+                if name.split('.', 1)[0] not in referenced:
+                    os.unlink(os.path.join(root, name))
+
+
+def create_storage(backend, directory):
+    """Build the storage backend selected by HOOL_STORAGE for one roster directory."""
+    if backend == 'json':
+        return JsonStorage(os.path.join(directory, 'data.json'))
+    if backend == 'sqlite':
+        return SqliteStorage(os.path.join(directory, 'roster.db'))
+    if backend == 'journal':
+        return JournalStorage(os.path.join(directory, 'data.json'), os.path.join(directory, 'data.journal'))
+    raise ValueError(f"Unknown storage backend: {backend!r} (expected 'json', 'sqlite' or 'journal')")
+
+
+# Cross-process locking (HOOL_MULTIPROCESS)
+
+def _lock_fd(fd, exclusive):
+    if fcntl is not None:
+        fcntl.flock(fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        return
+
+    # msvcrt only has exclusive byte-range locks; LK_LOCK gives up after ~10s
+    os.lseek(fd, LOCK_REGION_OFFSET, os.SEEK_SET)
+    for attempt in range(LOCK_ATTEMPTS):
+        try:
+            msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+            return
+        except OSError:
+            if attempt == LOCK_ATTEMPTS - 1:
+                raise
+
+
+def _unlock_fd(fd):
+    if fcntl is not None:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+        return
+
+    os.lseek(fd, LOCK_REGION_OFFSET, os.SEEK_SET)
+    msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+
+
+class RosterFileLock:
+    """Advisory lock on a roster's data.lock, shared by every process using it.
+
+    Readers take it shared and writers exclusive (on Windows it is always
+    exclusive). The file also holds a write generation that writers bump;
+    seeing it move on acquire means another process changed the roster, so
+    the in-memory copy is dropped. Callers must hold the roster's in-process
+    lock, which keeps threads from interleaving on the shared descriptor.
+    """
+
+    def __init__(self, path, roster):
+        self.path = path
+        self.roster = roster
+        self.fd = None
+        self.modes = []
+        self.generation = None
+
+    def acquire(self, exclusive):
+        # msvcrt locks are always exclusive and not re-entrant, so never re-lock there
+        exclusive = exclusive or fcntl is None
+        held = bool(self.modes) and self.modes[-1]
+        if not self.modes or (exclusive and not held):
+            if self.fd is None:
+                self.fd = os.open(self.path, os.O_RDWR | os.O_CREAT)
+            # Upgrading a shared lock is not atomic, so re-check the generation either way
+            _lock_fd(self.fd, exclusive)
+            self._check_generation()
+        self.modes.append(exclusive or held)
+
+    def release(self):
+        released = self.modes.pop()
+        if not self.modes:
+            _unlock_fd(self.fd)
+        elif released and not self.modes[-1]:
+            _lock_fd(self.fd, False)
+
+    def _read_generation(self):
+        os.lseek(self.fd, 0, os.SEEK_SET)
+        raw = os.read(self.fd, 32).strip()
+        return int(raw) if raw.isdigit() else 0
+
+    def _check_generation(self):
+        generation = self._read_generation()
+        if generation != self.generation:
+            self.roster.invalidate()
+            self.generation = generation
+
+    def bump(self):
+        """Record a write (caller holds the lock exclusively)."""
+        self.generation = self._read_generation() + 1
+        os.lseek(self.fd, 0, os.SEEK_SET)
+        os.write(self.fd, str(self.generation).encode().ljust(32))
+
+
+class CommitBatch:
+    """Saves merged into a single storage write."""
+
+    def __init__(self):
+        self.changes = []
+        self.done = threading.Event()
+        self.error = None
+
+    def wait(self):
+        """Block until the batch is written; re-raise the write error if it failed."""
+        self.done.wait()
+        if self.error is not None:
+            raise self.error
+
+
+def change_events(data, changes):
+    """(event, payload) pairs describing a save's `changes` for ChangeFeed subscribers."""
+    revision = data['meta'].get('revision', 0)
+    if changes is None:
+        return [('reload', {'revision': revision})]
+
+    by_id = {char['id']: char for char in data['characters']}
+    events = []
+    seen = set()
+    for char_id, section in changes:
+        if (char_id, section) in seen:
+            continue
+        seen.add((char_id, section))
+
+        if char_id is None:
+            payload = {'char_id': None, 'section': section, 'value': data.get(section)}
+        elif char_id not in by_id:
+            payload = {'char_id': char_id, 'deleted': True}
+        elif section is None:
+            payload = {'char_id': char_id, 'section': None, 'value': by_id[char_id]}
+        else:
+            payload = {'char_id': char_id, 'section': section, 'value': by_id[char_id].get(section)}
+        payload['revision'] = revision
+        events.append(('change', payload))
+    return events
+
+
+def data_delta(data, changed):
+    """The characters and roster keys named by a Roster.changes_since() set.
+
+    Characters saved whole come back whole; otherwise only the changed
+    sections (plus id and avg_ilvl). Removed characters are listed in
+    'deleted'. Meta is left to the caller, which always sends it.
+    """
+    by_id = {char['id']: char for char in data['characters']}
+    sections = {}
+    delta = {'characters': [], 'deleted': []}
+    for char_id, section in changed:
+        if char_id is None:
+            if section != 'meta':
+                delta[section] = data.get(section)
+        else:
+            sections.setdefault(char_id, set()).add(section)
+
+    for char_id, char_sections in sections.items():
+        char = by_id.get(char_id)
+        if char is None:
+            delta['deleted'].append(char_id)
+        elif None in char_sections:
+            delta['characters'].append(char)
+        else:
+            fragment = {'id': char_id, 'avg_ilvl': char.get('avg_ilvl')}
+            for section in char_sections:
+                fragment[section] = char.get(section)
+            delta['characters'].append(fragment)
+    return delta
+
+
+def fragment_response(fragments, rest):
+    """A JSON response of `rest` plus a 'characters' array spliced from encoded fragments.
+
+    Rosters of DATA_STREAM_MIN_CHARACTERS or more are streamed piece by
+    piece instead of being joined into one string first.
+    """
+    head = '{"characters":['
+    tail = '],' + app.json.dumps(rest)[1:]
+    if len(fragments) < DATA_STREAM_MIN_CHARACTERS:
+        return Response(head + ','.join(fragments) + tail, mimetype='application/json')
+
+    def generate():
+        yield head
+        for i, fragment in enumerate(fragments):
+            yield fragment if i == 0 else ',' + fragment
+        yield tail
+
+    return Response(generate(), mimetype='application/json')
+
+
+class ChangeFeed:
+    """A roster's committed changes, fanned out to /api/events subscribers.
+
+    Roster.write publishes once storage has accepted a write, so a batch's
+    events arrive together when the group-commit writer flushes it.
+    Events are serialized when published (the roster keeps changing after)
+    and the last CHANGE_FEED_BACKLOG are kept so reconnecting clients can
+    resume from Last-Event-ID; a client further behind is told to reload.
+    """
+
+    def __init__(self, backlog):
+        self.changed = threading.Condition()
+        self.events = collections.deque(maxlen=backlog)
+        self.seq = 0
+
+    def publish(self, data, changes):
+        encoded = [(event, json.dumps(payload)) for event, payload in change_events(data, changes)]
+        with self.changed:
+            for event, payload in encoded:
+                self.seq += 1
+                self.events.append((self.seq, event, payload))
+            self.changed.notify_all()
+
+    def wait(self, after, timeout):
+        """Events with a sequence number above `after`, waiting up to `timeout` for one."""
+        with self.changed:
+            if after > self.seq:
+                # An id from before a server restart
+                return [(self.seq, 'reload', '{}')]
+            if self.seq <= after:
+                self.changed.wait(timeout)
+            if self.events and self.events[0][0] > after + 1:
+                return [(self.seq, 'reload', '{}')]
+            return [entry for entry in self.events if entry[0] > after]
+
+
+class GroupCommitWriter:
+    """Single writer thread that flushes a dirty roster at most once per window.
+
+    A save after a quiet period is written straight away; saves arriving
+    within `window` seconds of the previous write are merged into one batch.
+    """
+
+    def __init__(self, roster, window):
+        self.roster = roster
+        self.window = window
+        self.cond = threading.Condition()
+        self.batch = None
+        self.data = None
+        self.last_flush = 0.0
+        self.thread = None
+
+    def submit(self, data, changes):
+        """Mark the roster dirty and return the batch that will carry the write."""
+        with self.cond:
+            if self.batch is None:
+                self.batch = CommitBatch()
+            batch = self.batch
+            self.data = data
+            if changes is None or batch.changes is None:
+                batch.changes = None
+            else:
+                batch.changes.extend(changes)
+
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name=f'group-commit-{self.roster.id}', daemon=True)
+                self.thread.start()
+            self.cond.notify()
+            return batch
+
+    def _run(self):
+        while True:
+            with self.cond:
+                while self.batch is None:
+                    self.cond.wait()
+                delay = self.last_flush + self.window - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            self.flush()
+
+    def flush(self):
+        """Write the open batch now, if there is one."""
+        with self.roster.lock:
+            with self.cond:
+                batch, data = self.batch, self.data
+                self.batch = None
+            if batch is None:
+                return
+
+            try:
+                self.roster.write(data, batch.changes)
+            except Exception as e:
+                print(f"Save error: {e}", file=sys.stderr)
+                batch.error = e
+                # Nobody may be waiting (wait=False saves), so drop the unwritten changes
+                # from memory too; otherwise a later partial write could persist only some
+                self.roster.invalidate()
+            finally:
+                self.last_flush = time.monotonic()
+                batch.done.set()
+
+
+# Bumped when summary fields are added, so older summary.json files are rebuilt
+ROSTER_SUMMARY_FORMAT = 2
+
+
+def build_roster_summary(roster_id, data):
+    """Small per-shard summary used by the cross-roster endpoints."""
+    characters = [
+        {
+            'id': char['id'],
+            'name': char.get('name', ''),
+            'class': char.get('class', ''),
+            'level': char.get('level', 0),
+            'avg_ilvl': calculate_avg_ilvl(char.get('gear', {})),
+            'last_gear_sync': char.get('last_gear_sync'),
+            # For the sync scheduler's queue
+            'realm': char.get('realm'),
+            'character_name': char.get('character_name'),
+            'last_login_timestamp': char.get('last_login_timestamp'),
+        }
+        for char in data['characters']
+    ]
+    return {
+        'format': ROSTER_SUMMARY_FORMAT,
+        'id': roster_id,
+        'name': data['meta'].get('roster_name', roster_id),
+        'character_count': len(characters),
+        'avg_ilvl': round(sum(c['avg_ilvl'] for c in characters) / len(characters), 1) if characters else 0,
+        'characters': characters,
+    }
+
+
+class Roster:
+    """One roster shard: its own directory, storage, cache, locks and commit writer.
+
+    Shards share nothing, so a write to one roster never serializes or
+    locks another.
+    """
+
+    def __init__(self, roster_id, directory):
+        self.id = roster_id
+        self.directory = directory
+        self.data_file = os.path.join(directory, 'data.json')
+        self.summary_file = os.path.join(directory, 'summary.json')
+        self.storage = create_storage(STORAGE_BACKEND, directory)
+        self.writer = GroupCommitWriter(self, COMMIT_WINDOW)
+        self.file_lock = RosterFileLock(os.path.join(directory, 'data.lock'), self) if MULTIPROCESS else None
+        self.archive = WeekArchive(directory)
+        self.snapshots = SnapshotStore(directory, self.archive)
+        self.feed = ChangeFeed(CHANGE_FEED_BACKLOG)
+        self.summary = None
+
+        # (revision, changes) for each save() since the roster was last read from
+        # storage; load_epoch counts those reads so ETags change with them
+        self.change_log = collections.deque(maxlen=CHANGE_LOG_SIZE)
+        self.load_epoch = 0
+
+        # Encoded JSON per character id for /api/data, dropped when save() names the character
+        self.fragments = {}
+
+        # In-process copy of the parsed roster. It is authoritative while storage is
+        # unchanged underneath us; an external edit (for data.json, a different
+        # mtime/size) forces a reload.
+        self.lock = threading.RLock()
+        self.cache = None
+        self.cache_signature = None
+
+    @contextlib.contextmanager
+    def locked(self, exclusive=False):
+        """Hold the in-process lock, plus the data.lock file lock in multi-process mode."""
+        with self.lock:
+            if self.file_lock is None:
+                yield
+                return
+
+            self.file_lock.acquire(exclusive)
+            try:
+                yield
+            finally:
+                self.file_lock.release()
+
+    def invalidate(self):
+        """Drop the in-memory roster so the next load() re-reads storage."""
+        with self.lock:
+            self.cache = None
+            self.cache_signature = None
+
+    def import_json(self, path):
+        """One-shot import of a data.json file into this roster's storage backend."""
+        with open(path, 'r') as f:
+            data = json.load(f)
+
+        data['characters'].sort(key=lambda c: c.get('order', c['id']))
+        apply_migrations(data)
+        self.write(data)
+        return data
+
+    def load(self):
+        """Return the roster, served from memory unless storage changed underneath us."""
+        with self.locked():
+            signature = self.storage.signature()
+            if self.cache is not None and signature is not None and signature == self.cache_signature:
+                return self.cache
+
+            # Not the first load: the roster was invalidated or changed underneath us
+            reloaded = self.load_epoch > 0
+            self.load_epoch += 1
+            self.change_log.clear()
+            self.fragments.clear()
+
+            if not self.storage.exists():
+                # First start on a database backend: bring the existing data.json over
+                if self.storage.name != 'json' and os.path.exists(self.data_file):
+                    return self.import_json(self.data_file)
+
+                # Initialize with default data if nothing is stored yet
+                default_data = init_default_data()
+                self.write(default_data)
+                return default_data
+
+            data = self.storage.load()
+
+            # Sort characters by order field
+            data['characters'].sort(key=lambda c: c.get('order', c['id']))
+
+            # Persist migrated data once so later loads skip the steps entirely;
+            # weeks that went cold since the last load move to the archive
+            migrated = apply_migrations(data)
+            archived = archive_cold_weeks(self.archive, data)
+            if migrated or archived:
+                data['meta']['revision'] = data['meta'].get('revision', 0) + 1
+                self.write(data)
+                return data
+
+            self.cache = data
+            self.cache_signature = signature
+            if reloaded:
+                # Another process, a cron sync or a hand edit changed it; the write()
+                # above would have published this itself
+                self.feed.publish(data, None)
+            return data
+
+    def write(self, data, changes=None):
+        """Write the roster to storage right away and make it the cached copy.
+
+        `changes` lists the (char_id, section) pairs the caller touched so
+        backends that support it can skip the rest; None writes everything.
+        """
+        with self.locked(exclusive=True):
+            try:
+                self.storage.save(data, changes)
+            except Exception:
+                # Readers may already hold the unsaved state from memory: drop it and
+                # have /api/events clients reload
+                self.invalidate()
+                self.feed.publish(data, None)
+                raise
+            if self.file_lock is not None:
+                self.file_lock.bump()
+
+            # Subscribers only hear about changes that reached storage
+            self.feed.publish(data, changes)
+
+            # Our own write must not look like an external edit
+            self.cache = data
+            self.cache_signature = self.storage.signature()
+
+            self.write_summary(data)
+            if self.snapshots.is_due():
+                try:
+                    self.snapshots.create(data)
+                except OSError as e:
+                    print(f"Snapshots: periodic snapshot failed for roster {self.id}: {e}", file=sys.stderr)
+
+    def save(self, data, changes=None, wait=True):
+        """Queue the roster for the group-commit writer and make it the cached copy.
+
+        With wait=True the call returns once the write is durable; inside a
+        roster_transaction that wait is deferred until the route has released
+        the roster lock. Outside one, don't wait while holding the lock.
+        """
+        with self.lock:
+            # A restored snapshot carries its old revision; keep counting up from ours
+            previous = self.cache['meta'].get('revision', 0) if self.cache is not None else 0
+            revision = max(previous, data['meta'].get('revision', 0)) + 1
+            data['meta']['revision'] = revision
+            data['meta']['last_updated'] = datetime.now(timezone.utc).isoformat().replace('+00:00', 'Z')
+            self.cache = data
+            self.change_log.append((revision, list(changes) if changes is not None else None))
+            if changes is None:
+                self.fragments.clear()
+            else:
+                for char_id, _ in changes:
+                    self.fragments.pop(char_id, None)
+
+            # Other processes only see what is on disk when they take the lock
+            if COMMIT_WINDOW <= 0 or MULTIPROCESS:
+                self.write(data, changes)
+                return
+
+            batch = self.writer.submit(data, changes)
+
+        if not wait:
+            return
+        if has_request_context() and g.get('pending_commits') is not None:
+            g.pending_commits.append(batch)
+        else:
+            batch.wait()
+
+    def character_json(self, char):
+        """`char` (with avg_ilvl) encoded as JSON, cached until a save() names it."""
+        with self.lock:
+            encoded = self.fragments.get(char['id'])
+            if encoded is None:
+                char['avg_ilvl'] = calculate_avg_ilvl(char['gear'])
+                encoded = self.fragments[char['id']] = app.json.dumps(char)
+            return encoded
+
+    def changes_since(self, revision, current):
+        """The (char_id, section) pairs saved after `revision`, up to `current`.
+
+        Returns None when the change log can't account for every revision in
+        between (too old, from before a reload, or written by another
+        process, or a whole-roster save); the caller then sends everything.
+        """
+        with self.lock:
+            if revision == current:
+                return set()
+            entries = [entry for entry in self.change_log if entry[0] > revision]
+            if (revision > current or len(entries) != current - revision
+                    or not entries or entries[0][0] != revision + 1):
+                return None
+
+            changed = set()
+            for _, changes in entries:
+                if changes is None:
+                    return None
+                changed.update(changes)
+            return changed
+
+    def compact_journal(self):
+        """Fold the journal into a fresh data.json snapshot (journal backend only)."""
+        with self.locked(exclusive=True):
+            data = self.load()
+            self.storage.compact(data)
+            self.cache_signature = self.storage.signature()
+
+    def write_summary(self, data):
+        """Rewrite summary.json if the roster's summary changed."""
+        summary = build_roster_summary(self.id, data)
+        if summary == self.summary:
+            return
+
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(summary, f)
+            os.replace(temp_path, self.summary_file)
+        except:
+            os.unlink(temp_path)
+            raise
+        self.summary = summary
+
+    def read_summary(self):
+        """Return the shard's summary without loading the roster (unless it has none yet)."""
+        try:
+            with open(self.summary_file, 'r') as f:
+                summary = json.load(f)
+            if summary.get('format') == ROSTER_SUMMARY_FORMAT:
+                return summary
+        except (FileNotFoundError, ValueError):
+            pass
+
+        with self.locked(exclusive=True):
+            self.write_summary(self.load())
+            return self.summary
+
+
+_rosters = {}
+_rosters_lock = threading.Lock()
+
+
+def roster_directory(roster_id):
+    """Existing installs keep the default roster's data.json at the top of HOOL_DATA_DIR."""
+    if roster_id == DEFAULT_ROSTER_ID:
+        return _data_dir
+    return os.path.join(ROSTERS_DIR, roster_id)
+
+
+def get_roster(roster_id, create=False):
+    """Return the shard for roster_id, or None if it doesn't exist (and create is False)."""
+    with _rosters_lock:
+        roster = _rosters.get(roster_id)
+        if roster is None:
+            if not ROSTER_ID_PATTERN.match(roster_id):
+                return None
+            directory = roster_directory(roster_id)
+            if not os.path.isdir(directory):
+                if not create:
+                    return None
+                os.makedirs(directory, exist_ok=True)
+            roster = _rosters[roster_id] = Roster(roster_id, directory)
+        return roster
+
+
+def list_roster_ids():
+    """All roster IDs on disk, default first."""
+    ids = [DEFAULT_ROSTER_ID]
+    if os.path.isdir(ROSTERS_DIR):
+        ids += sorted(
+            name for name in os.listdir(ROSTERS_DIR)
+            if name != DEFAULT_ROSTER_ID and ROSTER_ID_PATTERN.match(name)
+            and os.path.isdir(os.path.join(ROSTERS_DIR, name))
+        )
+    return ids
+
+
+def loaded_rosters():
+    with _rosters_lock:
+        return list(_rosters.values())
+
+
+def current_roster():
+    """The roster the current request is scoped to (the default one outside requests)."""
+    roster_id = g.get('roster_id') if has_request_context() else None
+    return get_roster(roster_id or DEFAULT_ROSTER_ID)
+
+
+def load_data():
+    """Return the current roster's data."""
+    return current_roster().load()
+
+
+def save_data(data, changes=None, wait=True):
+    """Save the current roster; see Roster.save()."""
+    current_roster().save(data, changes, wait)
+
+
+def invalidate_data_cache():
+    """Drop the current roster's in-memory copy."""
+    roster = current_roster()
+    if roster is not None:
+        roster.invalidate()
+
+
+def roster_lock(exclusive=False):
+    """Lock the current roster; see Roster.locked()."""
+    return current_roster().locked(exclusive)
+
+
+@contextlib.contextmanager
+def roster_write():
+    """Hold the roster lock exclusively for a load -> mutate -> save cycle.
+
+    Holding it for the whole cycle keeps concurrent requests, other
+    processes and the writer thread from seeing a half-applied change.
+    Saves made inside are waited for after the lock is released, so the
+    writer thread can take it.
+    """
+    outer = g.get('pending_commits') if has_request_context() else None
+    if outer is not None:
+        # Nested inside another roster_write: the outermost one waits
+        with roster_lock(exclusive=True):
+            yield
+        return
+
+    pending = []
+    if has_request_context():
+        g.pending_commits = pending
+    try:
+        with roster_lock(exclusive=True):
+            yield
+        for batch in pending:
+            batch.wait()
+    finally:
+        if has_request_context():
+            g.pending_commits = None
+
+
+def roster_transaction(view):
+    """Run a mutating route inside roster_write()."""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        with roster_write():
+            return view(*args, **kwargs)
+    return wrapper
+
+
+def flush_all_rosters():
+    """Write out every roster's pending batch (at interpreter exit)."""
+    for roster in loaded_rosters():
+        roster.writer.flush()
+
+
+atexit.register(flush_all_rosters)
+
+
+def run_journal_compactor():
+    """Background loop: compact any roster whose journal is too large or too old."""
+    while True:
+        time.sleep(min(JOURNAL_COMPACT_SECONDS, 30))
+        for roster in loaded_rosters():
+            try:
+                if roster.storage.needs_compaction():
+                    roster.compact_journal()
+            except Exception as e:
+                print(f"Journal compaction error ({roster.id}): {e}", file=sys.stderr)
+
+
+if STORAGE_BACKEND == 'journal':
+    threading.Thread(target=run_journal_compactor, name='journal-compactor', daemon=True).start()
 
 
 def get_character(data, char_id):
@@ -419,213 +2023,588 @@ def get_weekly_crest_cap(week):
     return 90 * week
 
 
+def parse_fields(value):
+    """Split a fields= parameter ("gear,crests.*.collected_this_week") into key paths.
+
+    Returns None when the parameter is absent, meaning every field.
+    """
+    if value is None:
+        return None
+    paths = []
+    for field in value.split(','):
+        path = tuple(field.strip().split('.'))
+        if all(path):
+            paths.append(path)
+    return paths
+
+
+def _project_path(source, path, target):
+    key, rest = path[0], path[1:]
+    for name in (list(source) if key == '*' else [key]):
+        if name not in source:
+            continue
+        value = source[name]
+        if not rest:
+            target[name] = value
+        elif isinstance(value, dict) and target.get(name) is not value:
+            _project_path(value, rest, target.setdefault(name, {}))
+
+
+def project_character(char, fields):
+    """The parts of `char` named by parse_fields() paths, always with its id.
+
+    '*' matches every key at its level; paths that don't exist are left out.
+    """
+    if fields is None:
+        return char
+    projected = {'id': char['id']}
+    for path in fields:
+        _project_path(char, path, projected)
+    return projected
+
+
 # Blizzard API Integration
 
-def get_blizzard_token(config):
-    """Get OAuth token from Blizzard API. Uses shared or custom credentials based on config."""
-    use_shared = config.get('use_shared_credentials', True)
+class RateLimiter:
+    """Token buckets per API client id, one per quota (per second and per hour).
+
+    acquire() waits until every bucket has a token instead of failing, and
+    pause() holds a client back after a 429 for as long as Retry-After asks.
+    """
+
+    def __init__(self, per_second, per_hour):
+        self.quotas = [(limit, period) for limit, period in ((per_second, 1.0), (per_hour, 3600.0)) if limit > 0]
+        self.lock = threading.Lock()
+        self.buckets = {}
+        self.blocked_until = {}
+
+    def _reserve(self, client_id, now):
+        """Take one token from every bucket, or return the seconds until that is possible."""
+        buckets = self.buckets.setdefault(client_id, [[limit, now] for limit, _ in self.quotas])
+        wait = self.blocked_until.get(client_id, 0) - now
+        for (limit, period), bucket in zip(self.quotas, buckets):
+            rate = limit / period
+            bucket[0] = min(limit, bucket[0] + (now - bucket[1]) * rate)
+            bucket[1] = now
+            if bucket[0] < 1:
+                wait = max(wait, (1 - bucket[0]) / rate)
+
+        if wait > 0:
+            return wait
+        for bucket in buckets:
+            bucket[0] -= 1
+        return 0
+
+    def acquire(self, client_id, max_wait):
+        """Block until a call is allowed. False if that would take longer than max_wait."""
+        deadline = time.monotonic() + max_wait
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                wait = self._reserve(client_id, now)
+            if not wait:
+                return True
+            if now + wait > deadline:
+                return False
+            time.sleep(wait)
+
+    def pause(self, client_id, seconds):
+        with self.lock:
+            until = time.monotonic() + seconds
+            self.blocked_until[client_id] = max(self.blocked_until.get(client_id, 0), until)
+
+
+def parse_retry_after(response):
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date); 1 if absent."""
+    value = response.headers.get('Retry-After')
+    if not value:
+        return 1.0
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, (email.utils.parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return 1.0
 
-    if use_shared:
-        # Use shared credentials (not exposed in UI)
-        client_id = DEFAULT_CLIENT_ID
-        client_secret = DEFAULT_CLIENT_SECRET
-    else:
-        # Use custom user-provided credentials
-        client_id = config.get('client_id')
-        client_secret = config.get('client_secret')
 
-    if not client_id or not client_secret:
-        return None
+class SingleFlight:
+    """Run one call per key at a time; concurrent callers with the same key share its result."""
 
-    # Check if token is still valid
-    if config.get('access_token') and config.get('token_expires'):
-        if time.time() < config['token_expires']:
-            return config['access_token']
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = {}
 
-    # Request new token
-    region = config.get('region', 'us')
-    token_url = f'https://{region}.battle.net/oauth/token'
+    def do(self, key, fn):
+        with self.lock:
+            call = self.calls.get(key)
+            leader = call is None
+            if leader:
+                call = self.calls[key] = {'done': threading.Event(), 'result': None, 'error': None}
 
-    try:
-        response = requests.post(
-            token_url,
-            data={'grant_type': 'client_credentials'},
-            auth=(client_id, client_secret),
-            timeout=10
-        )
-        response.raise_for_status()
-        token_data = response.json()
+        if not leader:
+            call['done'].wait()
+            if call['error'] is not None:
+                raise call['error']
+            return call['result']
 
-        config['access_token'] = token_data['access_token']
-        config['token_expires'] = time.time() + token_data.get('expires_in', 86400) - 300
+        try:
+            call['result'] = fn()
+            return call['result']
+        except Exception as e:
+            call['error'] = e
+            raise
+        finally:
+            with self.lock:
+                del self.calls[key]
+            call['done'].set()
+
+
+class BlizzardClient:
+    """Keep-alive access to the Blizzard API: one pooled requests.Session per region.
+
+    Every fetcher goes through get(), so URLs, namespaces and error strings
+    are built in one place, connections are reused across calls and every
+    call passes the rate limiter. Identical concurrent requests are coalesced
+    into one HTTP call whose parsed JSON every caller shares (read-only).
+    """
+
+    def __init__(self, pool_connections, pool_maxsize, limiter):
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.limiter = limiter
+        self.inflight = SingleFlight()
+        self.sessions = {}
+        self.lock = threading.Lock()
+
+    def session(self, region):
+        with self.lock:
+            session = self.sessions.get(region)
+            if session is None:
+                session = requests.Session()
+                adapter = requests.adapters.HTTPAdapter(pool_connections=self.pool_connections,
+                                                        pool_maxsize=self.pool_maxsize)
+                session.mount('https://', adapter)
+                self.sessions[region] = session
+            return session
+
+    @staticmethod
+    def character_path(realm, character_name, resource=None):
+        """Profile API path for a character, with realm and name normalized to slugs."""
+        realm_slug = realm.lower().replace(' ', '-').replace("'", "")
+        char_slug = character_name.lower()
+        path = f'/profile/wow/character/{realm_slug}/{char_slug}'
+        return f'{path}/{resource}' if resource else path
+
+    def get(self, config, path, namespace, timeout=15, validators=None):
+        """GET an API path in the 'static' or 'profile' namespace. Returns (json, error).
+
+        With a `validators` dict ({path: Last-Modified}) the request is
+        conditional: (None, None) means unchanged since the stored validator,
+        and a fresh Last-Modified is recorded in the dict.
+        """
+        token = get_blizzard_token(config)
+        if not token:
+            return None, "No valid API token"
+
+        region = config.get('region', 'us')
+        client_id, _ = get_blizzard_credentials(config)
+        if_modified_since = validators.get(path) if validators else None
+
+        key = (client_id, region, path, namespace, if_modified_since)
+        data, error, last_modified = self.inflight.do(
+            key, lambda: self._fetch(client_id, token, region, path, namespace, timeout, if_modified_since))
+
+        if validators is not None and last_modified:
+            validators[path] = last_modified
+        return data, error
+
+    def _fetch(self, client_id, token, region, path, namespace, timeout, if_modified_since):
+        """One rate-limited GET with 429 retries. Returns (json, error, Last-Modified)."""
+        url = f'https://{region}.api.blizzard.com{path}'
+        headers = {'Authorization': f'Bearer {token}'}
+        if if_modified_since:
+            headers['If-Modified-Since'] = if_modified_since
 
-        return config['access_token']
-    except Exception as e:
-        print(f"Token fetch error: {e}")
-        return None
+        try:
+            for attempt in range(API_MAX_RETRIES + 1):
+                if not self.limiter.acquire(client_id, API_MAX_WAIT):
+                    return None, "API error: 429", None
+
+                response = self.session(region).get(
+                    url,
+                    params={'namespace': f'{namespace}-{region}', 'locale': 'en_US'},
+                    headers=headers,
+                    timeout=timeout
+                )
+                if response.status_code != 429 or attempt == API_MAX_RETRIES:
+                    break
+
+                # Throttled anyway: hold every call on this client back, then retry
+                self.limiter.pause(client_id, parse_retry_after(response))
+
+            if response.status_code == 304:
+                return None, None, None
+            response.raise_for_status()
+            return response.json(), None, response.headers.get('Last-Modified')
+        except requests.exceptions.HTTPError as e:
+            return None, f"API error: {e.response.status_code}", None
+        except Exception as e:
+            return None, f"Request failed: {str(e)}", None
 
+    def get_character(self, config, realm, character_name, resource=None, validators=None):
+        """GET a character profile resource ('equipment', 'statistics', ...)."""
+        path = self.character_path(realm, character_name, resource)
+        return self.get(config, path, 'profile', validators=validators)
 
-def fetch_item_media(config, item_id):
-    """Fetch item icon from Blizzard API."""
-    token = get_blizzard_token(config)
-    if not token:
-        return None
 
-    region = config.get('region', 'us')
-    namespace = f'static-{region}'
+blizzard = BlizzardClient(HTTP_POOL_CONNECTIONS, HTTP_POOL_MAXSIZE,
+                          RateLimiter(API_RATE_PER_SECOND, API_RATE_PER_HOUR))
 
-    url = f'https://{region}.api.blizzard.com/data/wow/media/item/{item_id}'
 
-    try:
-        response = requests.get(
-            url,
-            params={'namespace': namespace, 'locale': 'en_US'},
-            headers={'Authorization': f'Bearer {token}'},
-            timeout=10
-        )
-        response.raise_for_status()
-        data = response.json()
+class TokenManager:
+    """OAuth client-credentials tokens per (credentials, region), cached in token_cache.json.
 
-        # Extract icon URL from assets
-        for asset in data.get('assets', []):
-            if asset.get('key') == 'icon':
-                return asset.get('value')
+    Refreshes are single-flight: one request to /oauth/token per key, with
+    concurrent callers waiting for it. Within TOKEN_REFRESH_MARGIN of expiry
+    the refresh runs in the background while callers keep the current token;
+    after a failed one, the next waits TOKEN_REFRESH_RETRY seconds.
+    """
 
-        return None
-    except:
-        return None
+    def __init__(self, path, refresh_margin):
+        self.path = path
+        self.refresh_margin = refresh_margin
+        self.lock = threading.Lock()
+        self.tokens = self._read()
+        self.refreshing = {}
+        self.failed = {}
 
+    @staticmethod
+    def key(client_id, client_secret, region):
+        # Hashed so the cache file names no credentials
+        return f"{region}:{hashlib.sha256(f'{client_id}:{client_secret}'.encode()).hexdigest()[:16]}"
 
-def fetch_character_profile(config, realm, character_name):
-    """Fetch basic character profile (class, race, etc) from Blizzard API."""
-    token = get_blizzard_token(config)
-    if not token:
-        return None, "No valid API token"
+    def _read(self):
+        try:
+            with open(self.path, 'r') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            print(f"Token cache unreadable, starting empty: {e}", file=sys.stderr)
+            return {}
+
+    def _write(self):
+        # Losing the cache only costs a token fetch, so failures are logged, not raised
+        try:
+            fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(self.path), suffix='.tmp')
+            with os.fdopen(fd, 'w') as f:
+                json.dump(self.tokens, f)
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            print(f"Token cache write failed: {e}", file=sys.stderr)
+
+    def get(self, client_id, client_secret, region):
+        key = self.key(client_id, client_secret, region)
+        with self.lock:
+            entry = self.tokens.get(key)
+            if entry is None or time.time() >= entry['expires'] - self.refresh_margin:
+                # Another process sharing the data directory may have refreshed it
+                self.tokens.update(self._read())
+                entry = self.tokens.get(key)
+            now = time.time()
+            if entry and now < entry['expires'] - self.refresh_margin:
+                return entry['access_token']
+
+            current = entry['access_token'] if entry and now < entry['expires'] else None
+            if current and now - self.failed.get(key, 0) < TOKEN_REFRESH_RETRY:
+                # The last refresh failed; don't hammer /oauth/token while this one still works
+                return current
+            event = self.refreshing.get(key)
+            leader = event is None
+            if leader:
+                event = self.refreshing[key] = threading.Event()
+
+        if leader and current:
+            threading.Thread(target=self._refresh, args=(key, client_id, client_secret, region, event),
+                             name='token-refresh', daemon=True).start()
+        elif leader:
+            self._refresh(key, client_id, client_secret, region, event)
+        elif not current:
+            event.wait(timeout=15)
+
+        if current:
+            return current
+        with self.lock:
+            entry = self.tokens.get(key)
+            return entry['access_token'] if entry and time.time() < entry['expires'] else None
+
+    def _refresh(self, key, client_id, client_secret, region, event):
+        try:
+            response = blizzard.session(region).post(
+                f'https://{region}.battle.net/oauth/token',
+                data={'grant_type': 'client_credentials'},
+                auth=(client_id, client_secret),
+                timeout=10
+            )
+            response.raise_for_status()
+            token_data = response.json()
+
+            with self.lock:
+                self.tokens[key] = {
+                    'access_token': token_data['access_token'],
+                    'expires': time.time() + token_data.get('expires_in', 86400) - 60,
+                }
+                self.failed.pop(key, None)
+                self._write()
+        except Exception as e:
+            print(f"Token fetch error: {e}", file=sys.stderr)
+            with self.lock:
+                self.failed[key] = time.time()
+        finally:
+            with self.lock:
+                self.refreshing.pop(key, None)
+            event.set()
+
+
+token_manager = TokenManager(os.path.join(_data_dir, 'token_cache.json'), TOKEN_REFRESH_MARGIN)
+
+
+class ItemMediaCache:
+    """Item id -> icon URL: a bounded in-memory LRU in front of item_media.db.
+
+    A None icon URL is a negative entry (the item has no icon) and expires
+    after the shorter negative TTL.
+    """
+
+    def __init__(self, path, max_entries, ttl, negative_ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.lock = threading.Lock()
+        self.memory = collections.OrderedDict()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute('CREATE TABLE IF NOT EXISTS item_media ('
+                          'item_id INTEGER PRIMARY KEY, icon_url TEXT, expires REAL NOT NULL)')
+
+    def _remember(self, item_id, icon_url, expires):
+        self.memory[item_id] = (icon_url, expires)
+        self.memory.move_to_end(item_id)
+        while len(self.memory) > self.max_entries:
+            self.memory.popitem(last=False)
+
+    def get(self, item_id):
+        """Returns (hit, icon_url)."""
+        now = time.time()
+        with self.lock:
+            entry = self.memory.get(item_id)
+            if entry is None:
+                entry = self.conn.execute(
+                    'SELECT icon_url, expires FROM item_media WHERE item_id = ?', (item_id,)).fetchone()
+                if entry is None or entry[1] <= now:
+                    return False, None
+                self._remember(item_id, *entry)
+            elif entry[1] <= now:
+                del self.memory[item_id]
+                return False, None
+
+            self.memory.move_to_end(item_id)
+            return True, entry[0]
+
+    def put(self, item_id, icon_url):
+        expires = time.time() + (self.ttl if icon_url else self.negative_ttl)
+        with self.lock:
+            self._remember(item_id, icon_url, expires)
+            with self.conn:
+                self.conn.execute('INSERT OR REPLACE INTO item_media (item_id, icon_url, expires) VALUES (?, ?, ?)',
+                                  (item_id, icon_url, expires))
+
+
+item_media_cache = ItemMediaCache(os.path.join(_data_dir, 'item_media.db'), ICON_CACHE_SIZE,
+                                  ICON_CACHE_TTL, ICON_CACHE_NEGATIVE_TTL)
+
+
+class ImageStore:
+    """Remote images downloaded once and stored by SHA-256 under images/.
+
+    index.db maps each source URL to its digest, so a URL already seen is
+    served from disk; fetch(refresh=True) downloads it again (avatars on sync).
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.lock = threading.Lock()
+        self.session = requests.Session()
+        self.inflight = SingleFlight()
+        self.conn = sqlite3.connect(os.path.join(directory, 'index.db'), check_same_thread=False)
+        self.conn.execute('CREATE TABLE IF NOT EXISTS images ('
+                          'url TEXT PRIMARY KEY, digest TEXT NOT NULL, content_type TEXT NOT NULL)')
+
+    @staticmethod
+    def allowed(url):
+        parts = urllib.parse.urlsplit(url)
+        host = (parts.hostname or '').lower()
+        return parts.scheme == 'https' and any(host == h or host.endswith('.' + h) for h in IMAGE_PROXY_HOSTS)
+
+    def path(self, digest):
+        return os.path.join(self.directory, digest[:2], digest)
+
+    def lookup(self, url):
+        """(digest, content_type) for a stored URL, or None."""
+        with self.lock:
+            return self.conn.execute('SELECT digest, content_type FROM images WHERE url = ?', (url,)).fetchone()
+
+    def content_type(self, digest):
+        with self.lock:
+            row = self.conn.execute('SELECT content_type FROM images WHERE digest = ? LIMIT 1', (digest,)).fetchone()
+        return row[0] if row else None
+
+    def fetch(self, url, refresh=False):
+        """Return (digest, content_type) for url, downloading it unless stored. None on failure."""
+        if not self.allowed(url):
+            return None
+        if not refresh:
+            stored = self.lookup(url)
+            if stored and os.path.exists(self.path(stored[0])):
+                return stored
+        return self.inflight.do(url, lambda: self._download(url))
+
+    def _download(self, url):
+        response = None
+        try:
+            # A redirect could point anywhere; allowed() only vouches for the URL asked for
+            response = self.session.get(url, timeout=15, stream=True, allow_redirects=False)
+            if response.is_redirect:
+                raise ValueError(f"redirected to {response.headers.get('Location')}")
+            response.raise_for_status()
+            content_type = response.headers.get('Content-Type', '').split(';')[0].strip()
+            if not content_type.startswith('image/'):
+                raise ValueError(f'not an image ({content_type or "no content type"})')
+
+            chunks = []
+            size = 0
+            for chunk in response.iter_content(64 * 1024):
+                chunks.append(chunk)
+                size += len(chunk)
+                if size > IMAGE_MAX_BYTES:
+                    raise ValueError('image too large')
+            body = b''.join(chunks)
+        except Exception as e:
+            print(f"Image proxy: failed to fetch {url}: {e}", file=sys.stderr)
+            return None
+        finally:
+            if response is not None:
+                response.close()
 
-    region = config.get('region', 'us')
-    namespace = f'profile-{region}'
+        digest = hashlib.sha256(body).hexdigest()
+        path = self.path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(body)
+            os.replace(temp_path, path)
 
-    realm_slug = realm.lower().replace(' ', '-').replace("'", "")
-    char_slug = character_name.lower()
+        with self.lock, self.conn:
+            self.conn.execute('INSERT OR REPLACE INTO images (url, digest, content_type) VALUES (?, ?, ?)',
+                              (url, digest, content_type))
+        return digest, content_type
 
-    url = f'https://{region}.api.blizzard.com/profile/wow/character/{realm_slug}/{char_slug}'
 
-    try:
-        response = requests.get(
-            url,
-            params={'namespace': namespace, 'locale': 'en_US'},
-            headers={'Authorization': f'Bearer {token}'},
-            timeout=15
-        )
-        response.raise_for_status()
-        data = response.json()
+image_store = ImageStore(os.path.join(_data_dir, 'images'))
 
-        # Extract class name
-        char_class = data.get('character_class', {}).get('name', '')
-        level = data.get('level', 0)
 
-        return {'class': char_class, 'level': level}, None
-    except requests.exceptions.HTTPError as e:
-        return None, f"API error: {e.response.status_code}"
-    except Exception as e:
-        return None, f"Request failed: {str(e)}"
+def get_blizzard_credentials(config):
+    """(client_id, client_secret) for the shared or custom credentials selected in config."""
+    if config.get('use_shared_credentials', True):
+        # Use shared credentials (not exposed in UI)
+        return DEFAULT_CLIENT_ID, DEFAULT_CLIENT_SECRET
 
+    # Use custom user-provided credentials
+    return config.get('client_id'), config.get('client_secret')
 
-def fetch_character_media(config, realm, character_name):
-    """Fetch character media (avatar, render) from Blizzard API."""
-    token = get_blizzard_token(config)
-    if not token:
-        return None, "No valid API token"
 
-    region = config.get('region', 'us')
-    namespace = f'profile-{region}'
+def get_blizzard_token(config):
+    """Get OAuth token from Blizzard API. Uses shared or custom credentials based on config."""
+    client_id, client_secret = get_blizzard_credentials(config)
 
-    realm_slug = realm.lower().replace(' ', '-').replace("'", "")
-    char_slug = character_name.lower()
+    if not client_id or not client_secret:
+        return None
 
-    url = f'https://{region}.api.blizzard.com/profile/wow/character/{realm_slug}/{char_slug}/character-media'
+    return token_manager.get(client_id, client_secret, config.get('region', 'us'))
 
-    try:
-        response = requests.get(
-            url,
-            params={'namespace': namespace, 'locale': 'en_US'},
-            headers={'Authorization': f'Bearer {token}'},
-            timeout=15
-        )
-        response.raise_for_status()
-        data = response.json()
-
-        # Extract avatar URL
-        avatar_url = None
-        for asset in data.get('assets', []):
-            if asset.get('key') == 'avatar':
-                avatar_url = asset.get('value')
-                break
-
-        return avatar_url, None
-    except requests.exceptions.HTTPError as e:
-        return None, f"API error: {e.response.status_code}"
-    except Exception as e:
-        return None, f"Request failed: {str(e)}"
 
+def fetch_item_media(config, item_id):
+    """Fetch item icon from Blizzard API. Returns (icon_url, error); (None, None) if the item has no icon."""
+    data, error = blizzard.get(config, f'/data/wow/media/item/{item_id}', 'static', timeout=10)
+    if error:
+        return None, error
 
-def fetch_character_stats(config, realm, character_name):
-    """Fetch character stats from Blizzard API."""
-    token = get_blizzard_token(config)
-    if not token:
-        return None, "No valid API token"
+    # Extract icon URL from assets
+    for asset in data.get('assets', []):
+        if asset.get('key') == 'icon':
+            return asset.get('value'), None
 
-    region = config.get('region', 'us')
-    namespace = f'profile-{region}'
+    return None, None
 
-    realm_slug = realm.lower().replace(' ', '-').replace("'", "")
-    char_slug = character_name.lower()
 
-    url = f'https://{region}.api.blizzard.com/profile/wow/character/{realm_slug}/{char_slug}/statistics'
+def get_item_icon_url(config, item_id):
+    """Icon URL for an item, served from item_media_cache after the first lookup."""
+    hit, icon_url = item_media_cache.get(item_id)
+    if hit:
+        return icon_url
 
-    try:
-        response = requests.get(
-            url,
-            params={'namespace': namespace, 'locale': 'en_US'},
-            headers={'Authorization': f'Bearer {token}'},
-            timeout=15
-        )
-        response.raise_for_status()
-        return response.json(), None
-    except requests.exceptions.HTTPError as e:
-        return None, f"API error: {e.response.status_code}"
-    except Exception as e:
-        return None, f"Request failed: {str(e)}"
+    icon_url, error = fetch_item_media(config, item_id)
+    # Remember "no icon" answers too, but not failures that may be transient
+    if error is None or error == "API error: 404":
+        item_media_cache.put(item_id, icon_url)
+    return icon_url
 
 
-def fetch_character_equipment(config, realm, character_name):
-    """Fetch character equipment from Blizzard API."""
-    token = get_blizzard_token(config)
-    if not token:
-        return None, "No valid API token"
+def fetch_character_profile(config, realm, character_name, validators=None):
+    """Fetch basic character profile (class, race, etc) from Blizzard API."""
+    data, error = blizzard.get_character(config, realm, character_name, validators=validators)
+    if data is None:
+        return None, error
 
-    region = config.get('region', 'us')
-    namespace = f'profile-{region}'
+    # Extract class name
+    char_class = data.get('character_class', {}).get('name', '')
+    level = data.get('level', 0)
 
-    # Normalize realm and character name
-    realm_slug = realm.lower().replace(' ', '-').replace("'", "")
-    char_slug = character_name.lower()
+    return {
+        'class': char_class,
+        'level': level,
+        'last_login_timestamp': data.get('last_login_timestamp'),
+        'equipped_item_level': data.get('equipped_item_level'),
+    }, None
 
-    url = f'https://{region}.api.blizzard.com/profile/wow/character/{realm_slug}/{char_slug}/equipment'
 
-    try:
-        response = requests.get(
-            url,
-            params={'namespace': namespace, 'locale': 'en_US'},
-            headers={'Authorization': f'Bearer {token}'},
-            timeout=15
-        )
-        response.raise_for_status()
-        return response.json(), None
-    except requests.exceptions.HTTPError as e:
-        return None, f"API error: {e.response.status_code}"
-    except Exception as e:
-        return None, f"Request failed: {str(e)}"
+def fetch_character_media(config, realm, character_name, validators=None):
+    """Fetch character media (avatar, render) from Blizzard API."""
+    data, error = blizzard.get_character(config, realm, character_name, 'character-media', validators)
+    if data is None:
+        return None, error
+
+    # Extract avatar URL
+    avatar_url = None
+    for asset in data.get('assets', []):
+        if asset.get('key') == 'avatar':
+            avatar_url = asset.get('value')
+            break
+
+    return avatar_url, None
+
+
+def fetch_character_stats(config, realm, character_name, validators=None):
+    """Fetch character stats from Blizzard API."""
+    return blizzard.get_character(config, realm, character_name, 'statistics', validators)
+
+
+def fetch_character_equipment(config, realm, character_name, validators=None):
+    """Fetch character equipment from Blizzard API."""
+    return blizzard.get_character(config, realm, character_name, 'equipment', validators)
 
 
 def parse_character_stats(stats_data):
@@ -764,8 +2743,471 @@ def parse_equipment_response(api_data, existing_gear):
     return existing_gear, equipped_avg_ilvl
 
 
+def character_activity(char):
+    """What change-detection sync compares: last login and equipped item level from the last sync."""
+    return {key: char.get(key) for key in ('last_login_timestamp', 'equipped_item_level')}
+
+
+def profile_changed(profile_data, activity):
+    """Whether a fresh profile summary shows activity since the stored one."""
+    if not activity or all(value is None for value in activity.values()):
+        return True
+    if profile_data is None:
+        # 304: the profile hasn't changed at all
+        return False
+    if profile_data.get('last_login_timestamp') is not None and activity.get('last_login_timestamp') is not None:
+        return profile_data['last_login_timestamp'] != activity['last_login_timestamp']
+    if profile_data.get('equipped_item_level') is not None and activity.get('equipped_item_level') is not None:
+        return profile_data['equipped_item_level'] != activity['equipped_item_level']
+    return True
+
+
+def fetch_character_sync(config, realm, character_name, validators=None, activity=None, force=False):
+    """Fetch equipment, profile, media and stats for one character. Returns (payload, error).
+
+    `validators` are the character's stored Last-Modified values; endpoints
+    that answer 304 come back as None and leave that part of the character
+    untouched. The profile summary is fetched first: unless `force`, a
+    character whose last login and equipped item level match `activity`
+    skips the other three calls (payload['unchanged']).
+    """
+    validators = dict(validators or {})
+    prefix = BlizzardClient.character_path(realm, character_name)
+
+    # Without stored activity a 304 would leave nothing to compare against next
+    # time (a manual gear edit clears it), so ask for the full profile
+    if not activity or all(value is None for value in activity.values()):
+        validators.pop(prefix, None)
+
+    # Fetch character profile (class, level, last login)
+    profile_data, profile_error = fetch_character_profile(config, realm, character_name, validators)
+    unchanged = not force and not profile_error and not profile_changed(profile_data, activity)
+
+    api_data = avatar_url = stats_data = None
+    if not unchanged:
+        # Fetch equipment
+        api_data, error = fetch_character_equipment(config, realm, character_name, validators)
+        if error:
+            return None, error
+
+        # Fetch character media (avatar)
+        avatar_url, _ = fetch_character_media(config, realm, character_name, validators)
+
+        # Fetch character stats
+        stats_data, _ = fetch_character_stats(config, realm, character_name, validators)
+
+    # Avatars are the one image refreshed on every sync that returns one
+    avatar_image = image_store.fetch(avatar_url, refresh=True) if avatar_url else None
+
+    # Keep only this realm/name's endpoints so a renamed character starts fresh
+    validators = {path: value for path, value in validators.items()
+                  if path == prefix or path.startswith(prefix + '/')}
+
+    return {
+        'equipment': api_data,
+        'profile': profile_data,
+        'avatar_url': avatar_url,
+        'avatar_image': avatar_image[0] if avatar_image else None,
+        'stats': stats_data,
+        'validators': validators,
+        'unchanged': unchanged,
+    }, None
+
+
+def apply_character_sync(char, payload):
+    """Merge a fetch_character_sync() payload into a character."""
+    # Parse and update gear (preserves Track values)
+    char['gear'], api_avg_ilvl = parse_equipment_response(payload['equipment'], char['gear'])
+
+    # Use API's calculated ilvl if available, otherwise calculate manually
+    if api_avg_ilvl is not None:
+        char['avg_ilvl'] = round(api_avg_ilvl, 1)
+    else:
+        char['avg_ilvl'] = calculate_avg_ilvl(char['gear'])
+
+    profile_data = payload['profile']
+    if profile_data:
+        char['class'] = profile_data.get('class', '')
+        char['level'] = profile_data.get('level', 0)
+        for key in ('last_login_timestamp', 'equipped_item_level'):
+            if profile_data.get(key) is not None:
+                char[key] = profile_data[key]
+
+    if payload['avatar_url']:
+        char['avatar_url'] = payload['avatar_url']
+    if payload.get('avatar_image'):
+        char['avatar_image'] = payload['avatar_image']
+
+    if payload['stats']:
+        char['stats'] = parse_character_stats(payload['stats'])
+
+    char['sync_validators'] = payload.get('validators', {})
+
+    char['last_gear_sync'] = datetime.now(timezone.utc).isoformat().replace('+00:00', 'Z')
+
+    # BiS auto-check: mark matching items as obtained
+    synced_item_ids = set()
+    for slot_data in char['gear'].values():
+        iid = slot_data.get('item_id')
+        if iid:
+            synced_item_ids.add(int(iid))
+    for bis_item in char.get('bis_list', []):
+        if bis_item.get('item_id') and int(bis_item['item_id']) in synced_item_ids:
+            bis_item['obtained'] = True
+            bis_item['synced'] = True
+
+
+def fetch_sync_target(config, target, force=False):
+    """Fetch one sync-all target tuple. Returns (result, payload); payload is None on failure."""
+    char_id, name, realm, character_name, validators, activity = target
+    try:
+        if not realm or not character_name:
+            return {'id': char_id, 'name': name, 'success': False, 'error': 'Not configured'}, None
+
+        payload, error = fetch_character_sync(config, realm, character_name, validators, activity, force)
+        if not error:
+            return {'id': char_id, 'name': name, 'success': True, 'unchanged': payload['unchanged']}, payload
+        if '429' in str(error):
+            return {'id': char_id, 'name': name, 'success': False, 'error': 'Rate limit reached. Consider adding your own API key in Settings for higher limits.'}, None
+        return {'id': char_id, 'name': name, 'success': False, 'error': error}, None
+    except Exception as e:
+        return {'id': char_id, 'name': name, 'success': False, 'error': f'Sync error: {str(e)}'}, None
+
+
+def sync_target(char):
+    """The fields fetch_sync_target() needs, copied so fetching can run without the roster lock."""
+    return (char['id'], char['name'], char.get('realm'), char.get('character_name'),
+            char.get('sync_validators'), character_activity(char))
+
+
+def commit_character_sync(roster, result, payload):
+    """Apply a fetched payload to the roster and queue the save; updates `result` on failure."""
+    with roster.locked(exclusive=True):
+        data = roster.load()
+        char = get_character(data, result['id'])
+        if not char:
+            result.update(success=False, error='Character not found')
+            return
+        try:
+            apply_character_sync(char, payload)
+        except Exception as e:
+            # The cached character may be half-updated; reload it from storage
+            roster.invalidate()
+            result.update(success=False, error=f'Sync error: {str(e)}')
+            return
+        roster.save(data, [(result['id'], None)], wait=False)
+
+
+# Background sync scheduler
+#
+# Picks the next character to sync across every roster from a priority queue
+# ranked by staleness (last_gear_sync), recent activity (last login) and
+# manual boosts, and spends at most AUTO_SYNC_BUDGET API calls per hour.
+# Failures back off exponentially. The queue is built from shard summaries;
+# only the roster of the character being synced is loaded. It is opt-in
+# (HOOL_AUTO_SYNC_BUDGET) and started by the server's __main__.
+
+def parse_timestamp(value):
+    """Epoch seconds for an ISO-8601 timestamp as stored in the roster, or None."""
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp()
+    except ValueError:
+        return None
+
+
+class SyncScheduler:
+    """Continuous background sync within an hourly API-call budget."""
+
+    # Calls a sync may make: the profile check plus equipment, media and stats
+    MAX_CALLS_PER_SYNC = 4
+
+    def __init__(self, budget_per_hour):
+        self.budget_per_hour = budget_per_hour
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.states = {}
+        self.calls = collections.deque()
+        self.current = None
+        self.recent = collections.deque(maxlen=20)
+        self.thread = None
+
+    def state(self, roster_id, char_id):
+        return self.states.setdefault((roster_id, char_id), {
+            'boost': 0, 'failures': 0, 'next_attempt': 0, 'last_error': None, 'last_attempt': None,
+            'last_synced': None})
+
+    def boost(self, roster_id, char_id):
+        """Move a character to the front of the queue."""
+        with self.lock:
+            self.state(roster_id, char_id)['boost'] += AUTO_SYNC_BOOST_SECONDS
+            self.state(roster_id, char_id)['next_attempt'] = 0
+        self.wake.set()
+
+    def calls_last_hour(self, now):
+        while self.calls and self.calls[0][0] <= now - 3600:
+            self.calls.popleft()
+        return sum(count for _, count in self.calls)
+
+    @staticmethod
+    def last_sync(char, state):
+        """When the character was last synced; a summary can lag behind a sync we just committed."""
+        times = [t for t in (parse_timestamp(char.get('last_gear_sync')), state['last_synced']) if t]
+        return max(times) if times else None
+
+    def priority(self, char, state, now):
+        """Seconds of effective staleness; higher syncs sooner."""
+        last_sync = self.last_sync(char, state)
+        age = now - last_sync if last_sync else now
+        last_login = char.get('last_login_timestamp')
+        if last_login and now - last_login / 1000 < AUTO_SYNC_ACTIVE_SECONDS:
+            age *= 2
+        return age + state['boost']
+
+    def queue(self, now, roster_ids=None):
+        """(priority, roster_id, char, state) for every configured character, best first.
+
+        `char` is the character's entry in its roster summary. Call without
+        self.lock held: reading summaries may rebuild one.
+        """
+        summaries = []
+        for roster_id in roster_ids or list_roster_ids():
+            roster = get_roster(roster_id)
+            if roster is not None:
+                summaries.append(roster.read_summary())
+
+        entries = []
+        with self.lock:
+            for summary in summaries:
+                for char in summary['characters']:
+                    if not char.get('realm') or not char.get('character_name'):
+                        continue
+                    state = self.state(summary['id'], char['id'])
+                    entries.append((self.priority(char, state, now), summary['id'], char, state))
+        entries.sort(key=lambda entry: entry[0], reverse=True)
+        return entries
+
+    def next_candidate(self, now):
+        queue = self.queue(now)
+        with self.lock:
+            for priority, roster_id, char, state in queue:
+                last_sync = self.last_sync(char, state)
+                due = state['boost'] or not last_sync or now - last_sync >= AUTO_SYNC_MIN_AGE
+                if due and state['next_attempt'] <= now:
+                    return roster_id, char
+        return None
+
+    def sync_one(self, roster_id, char):
+        """Fetch and commit one character. Returns the number of API calls spent."""
+        roster = get_roster(roster_id)
+        with roster.locked():
+            data = roster.load()
+            config = data['blizzard_config']
+            target = get_character(data, char['id'])
+            target = sync_target(target) if target else None
+        if target is None:
+            return 0
+
+        result, payload = fetch_sync_target(config, target)
+        if payload is not None:
+            commit_character_sync(roster, result, payload)
+        error = result.get('error')
+
+        now = time.time()
+        with self.lock:
+            state = self.state(roster_id, char['id'])
+            state['last_attempt'] = now
+            if error:
+                state['failures'] += 1
+                state['last_error'] = error
+                state['next_attempt'] = now + min(AUTO_SYNC_RETRY_BASE * 2 ** (state['failures'] - 1),
+                                                  AUTO_SYNC_RETRY_MAX)
+            else:
+                state.update(boost=0, failures=0, last_error=None, next_attempt=0, last_synced=now)
+            self.recent.appendleft({'roster_id': roster_id, 'id': char['id'], 'name': char['name'],
+                                    'success': not error, 'error': error,
+                                    'unchanged': bool(payload and payload['unchanged']), 'at': now})
+
+        return 1 if payload and payload['unchanged'] else self.MAX_CALLS_PER_SYNC
+
+    def run(self):
+        while True:
+            now = time.time()
+            with self.lock:
+                budget_left = self.budget_per_hour - self.calls_last_hour(now)
+
+            candidate = self.next_candidate(now) if budget_left >= self.MAX_CALLS_PER_SYNC else None
+            if candidate is None:
+                self.wake.wait(AUTO_SYNC_IDLE_SECONDS)
+                self.wake.clear()
+                continue
+
+            with self.lock:
+                self.current = {'roster_id': candidate[0], 'id': candidate[1]['id'], 'name': candidate[1]['name']}
+            try:
+                spent = self.sync_one(*candidate)
+            except Exception as e:
+                print(f"Sync scheduler: {e}", file=sys.stderr)
+                spent = self.MAX_CALLS_PER_SYNC
+            with self.lock:
+                self.current = None
+                self.calls.append((time.time(), spent))
+
+            # Spread the budget evenly over the hour instead of bursting it
+            self.wake.wait(spent * 3600 / self.budget_per_hour)
+            self.wake.clear()
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, name='sync-scheduler', daemon=True)
+        self.thread.start()
+
+    def status(self, roster_id):
+        now = time.time()
+        queue = self.queue(now, [roster_id])
+        with self.lock:
+            return {
+                'enabled': self.thread is not None,
+                'budget_per_hour': self.budget_per_hour,
+                'calls_last_hour': self.calls_last_hour(now),
+                'current': self.current,
+                'queue': [{
+                    'id': char['id'],
+                    'name': char['name'],
+                    'priority': round(priority),
+                    'last_gear_sync': char.get('last_gear_sync'),
+                    'boosted': bool(state['boost']),
+                    'failures': state['failures'],
+                    'last_error': state['last_error'],
+                    'retry_at': state['next_attempt'] or None,
+                } for priority, _, char, state in queue],
+                'recent': [entry for entry in self.recent if entry['roster_id'] == roster_id],
+            }
+
+
+sync_scheduler = SyncScheduler(AUTO_SYNC_BUDGET)
+
+
+# Sync jobs
+#
+# /api/sync-all starts a SyncJob and returns its id right away. Characters are
+# fetched on a worker pool and each one is applied and saved (through the
+# group-commit writer) as it completes; results are streamed to subscribers
+# of the job's events route.
+
+class SyncJob:
+    """One sync-all run: its targets, per-character results so far, and state."""
+
+    def __init__(self, roster_id, targets, force):
+        self.id = uuid.uuid4().hex
+        self.roster_id = roster_id
+        self.targets = targets
+        self.force = force
+        self.state = 'running'
+        self.created = time.time()
+        self.finished = None
+        self.error = None
+        self.results = []
+        self.cancelled = threading.Event()
+        self.changed = threading.Condition()
+
+    def add_result(self, result):
+        with self.changed:
+            self.results.append(result)
+            self.changed.notify_all()
+
+    def finish(self, error=None):
+        with self.changed:
+            self.error = error
+            if error is not None:
+                self.state = 'failed'
+            else:
+                self.state = 'cancelled' if self.cancelled.is_set() else 'done'
+            self.finished = time.time()
+            self.changed.notify_all()
+
+    def summary(self):
+        order = {target[0]: index for index, target in enumerate(self.targets)}
+        results = sorted(self.results, key=lambda r: order.get(r['id'], len(order)))
+        return {
+            'job_id': self.id,
+            'state': self.state,
+            'total': len(self.targets),
+            'completed': len(results),
+            'succeeded': sum(1 for r in results if r['success']),
+            'error': self.error,
+            'results': results,
+        }
+
+    def run(self):
+        roster = get_roster(self.roster_id)
+        config = None
+
+        def work(target):
+            if self.cancelled.is_set():
+                result = {'id': target[0], 'name': target[1], 'success': False, 'error': 'Cancelled'}
+            else:
+                result, payload = fetch_sync_target(config, target, self.force)
+                if payload is not None:
+                    commit_character_sync(roster, result, payload)
+            self.add_result(result)
+
+        error = None
+        try:
+            with roster.locked():
+                config = roster.load()['blizzard_config']
+            with ThreadPoolExecutor(max_workers=SYNC_CONCURRENCY) as pool:
+                list(pool.map(work, self.targets))
+        except Exception as e:
+            print(f"Sync job {self.id} failed: {e}", file=sys.stderr)
+            error = f'Sync failed: {str(e)}'
+        finally:
+            self.finish(error)
+
+
+_sync_jobs = {}
+_sync_jobs_lock = threading.Lock()
+
+
+def start_sync_job(roster_id, targets, force):
+    job = SyncJob(roster_id, targets, force)
+    with _sync_jobs_lock:
+        # Forget finished jobs after an hour
+        for job_id in [jid for jid, j in _sync_jobs.items() if j.finished and time.time() - j.finished > 3600]:
+            del _sync_jobs[job_id]
+        _sync_jobs[job.id] = job
+    threading.Thread(target=job.run, name=f'sync-job-{job.id[:8]}', daemon=True).start()
+    return job
+
+
+def get_sync_job(job_id):
+    with _sync_jobs_lock:
+        return _sync_jobs.get(job_id)
+
+
 # Routes
 
+@app.url_value_preprocessor
+def pull_roster_id(endpoint, values):
+    """Routes mirrored under /api/rosters/<roster_id>/ act on that roster."""
+    if values and 'roster_id' in values:
+        g.roster_id = values.pop('roster_id')
+
+
+@app.before_request
+def check_roster_exists():
+    roster_id = g.get('roster_id')
+    if roster_id is not None and get_roster(roster_id) is None:
+        return jsonify({'error': 'Roster not found'}), 404
+
+
+@app.teardown_request
+def discard_data_cache_on_error(exc):
+    """A request that raised may have half-mutated the cached roster; reload it from disk."""
+    if exc is not None:
+        invalidate_data_cache()
+
+
 @app.route('/')
 def index():
     """Serve the main SPA."""
@@ -774,23 +3216,75 @@ def index():
 
 @app.route('/api/data')
 def get_data():
-    """Return full application data."""
+    """Return full application data.
+
+    Responses carry an ETag built from the roster revision, so an unchanged
+    roster answers If-None-Match with 304. ?since=<revision> returns only
+    what changed after that revision, or the full data (with 'full': true)
+    when the server can no longer tell. ?fields= trims each character to the
+    listed fields (see parse_fields()).
+    """
     try:
-        data = load_data()
-        # Add computed fields
-        for char in data['characters']:
-            char['avg_ilvl'] = calculate_avg_ilvl(char['gear'])
-
-        # Auto-inject current week based on region
-        region = data.get('blizzard_config', {}).get('region', 'us')
-        data['meta']['current_week'] = calculate_current_week(region)
-
-        current_week = data['meta'].get('current_week', 0)
-        data['weekly_target'] = get_weekly_target(current_week)
-        data['weekly_crest_cap'] = get_weekly_crest_cap(current_week)
-        data['weekly_tasks'] = get_weekly_tasks(current_week)
+        roster = current_roster()
+        since = request.args.get('since', type=int)
+        fields = parse_fields(request.args.get('fields'))
+
+        # Serialize under the roster lock so a concurrent mutation can't change it mid-encode
+        with roster_lock():
+            data = load_data()
+            revision = data['meta'].get('revision', 0)
+
+            # Auto-inject current week based on region; it moves with the calendar,
+            # so it is part of the ETag alongside the revision
+            region = data.get('blizzard_config', {}).get('region', 'us')
+            current_week = calculate_current_week(region)
+            etag = f'{revision}-{roster.load_epoch}-{current_week}'
+            if since is None and request.if_none_match.contains(etag):
+                response = Response(status=304)
+                response.set_etag(etag)
+                return response
+
+            changed = roster.changes_since(since, revision) if since is not None else None
+            if changed is None and fields is None:
+                # The whole roster: each character's JSON comes from the roster's
+                # fragment cache, so only characters saved since the last read are encoded
+                fragments = [roster.character_json(char) for char in data['characters']]
+                response = {key: value for key, value in data.items() if key != 'characters'}
+                if since is not None:
+                    response['full'] = True
+            else:
+                # Add computed fields
+                for char in data['characters']:
+                    char['avg_ilvl'] = calculate_avg_ilvl(char['gear'])
 
-        return jsonify(data)
+                fragments = None
+                if changed is not None:
+                    response = data_delta(data, changed)
+                    response['full'] = False
+                else:
+                    # Response-only fields go on a shallow copy so they never reach the
+                    # cached roster (and from there data.json on the next save)
+                    response = dict(data)
+                    if since is not None:
+                        response['full'] = True
+
+                if fields is not None:
+                    response['characters'] = [project_character(char, fields) for char in response['characters']]
+
+            response['revision'] = revision
+            response['meta'] = dict(data['meta'], current_week=current_week)
+            response['weekly_target'] = get_weekly_target(current_week)
+            response['weekly_crest_cap'] = get_weekly_crest_cap(current_week)
+            response['weekly_tasks'] = get_weekly_tasks(current_week)
+
+            if fragments is None:
+                response = jsonify(response)
+            else:
+                response = fragment_response(fragments, response)
+            if since is None:
+                response.set_etag(etag)
+            response.headers['Cache-Control'] = 'no-cache'
+            return response
     except Exception as e:
         print(f"Error in get_data: {e}")
         import traceback
@@ -799,6 +3293,7 @@ def get_data():
 
 
 @app.route('/api/meta', methods=['POST'])
+@roster_transaction
 def update_meta():
     """Update meta information (week number, etc)."""
     data = load_data()
@@ -814,7 +3309,11 @@ def update_meta():
             # Update displayed week values and reset daily tasks when changing weeks
             if new_week != old_week:
                 new_week_str = str(new_week)
+                archive_store = current_roster().archive
                 for char in data['characters']:
+                    # Navigating back to an archived week brings it into the hot document
+                    restore_archived_week(archive_store, char, new_week_str)
+
                     # Update collected_this_week to show the new week's value from history
                     for crest_type, crest_data in char['crests'].items():
                         if 'weekly_history' not in crest_data:
@@ -838,11 +3337,16 @@ def update_meta():
 
                     # Note: Weekly tasks persist and show completion history
 
-    save_data(data)
+                archive_cold_weeks(archive_store, data)
+
+    # A week change rewrites every character; otherwise only meta changed
+    week_changed = data['meta']['current_week'] != old_week
+    save_data(data, None if week_changed else [(None, 'meta')])
     return jsonify({'success': True, 'meta': data['meta']})
 
 
 @app.route('/api/character/<int:char_id>/gear', methods=['POST'])
+@roster_transaction
 def update_gear(char_id):
     """Update gear slot (manual override)."""
     data = load_data()
@@ -864,11 +3368,18 @@ def update_gear(char_id):
 
         char['avg_ilvl'] = calculate_avg_ilvl(char['gear'])
 
-    save_data(data)
+        # A manual edit must not survive the next sync as "not modified" or "unchanged"
+        char['sync_validators'] = {path: value for path, value in char.get('sync_validators', {}).items()
+                                   if not path.endswith('/equipment')}
+        char.pop('last_login_timestamp', None)
+        char.pop('equipped_item_level', None)
+
+    save_data(data, [(char_id, None)])
     return jsonify({'success': True, 'character': char})
 
 
 @app.route('/api/character/<int:char_id>/crests', methods=['POST'])
+@roster_transaction
 def update_crests(char_id):
     """Update crest values - stores weekly history and calculates total automatically."""
     data = load_data()
@@ -895,15 +3406,16 @@ def update_crests(char_id):
             # Update current week display
             char['crests'][crest_type]['collected_this_week'] = new_weekly
 
-            # Calculate total from all weeks in history
-            total = sum(char['crests'][crest_type]['weekly_history'].values())
+            # Calculate total from all weeks in history (archived weeks are pre-summed)
+            total = char['crests'][crest_type].get('archived_total', 0) + sum(char['crests'][crest_type]['weekly_history'].values())
             char['crests'][crest_type]['total_collected'] = total
 
-    save_data(data)
+    save_data(data, [(char_id, 'crests')])
     return jsonify({'success': True, 'character': char})
 
 
 @app.route('/api/character/<int:char_id>/profession', methods=['POST'])
+@roster_transaction
 def update_profession(char_id):
     """Update profession progress."""
     data = load_data()
@@ -928,11 +3440,12 @@ def update_profession(char_id):
         if 'concentration' in updates:
             prof['concentration'] = max(0, min(1000, int(updates['concentration'])))
 
-    save_data(data)
+    save_data(data, [(char_id, 'profession_progress')])
     return jsonify({'success': True, 'character': char})
 
 
 @app.route('/api/character/<int:char_id>/tasks', methods=['POST'])
+@roster_transaction
 def update_tasks(char_id):
     """Update weekly/daily task completion."""
     data = load_data()
@@ -962,11 +3475,12 @@ def update_tasks(char_id):
     elif task_type == 'daily':
         char['daily_tasks'][task_id] = done
 
-    save_data(data)
+    save_data(data, [(char_id, 'weekly_tasks'), (char_id, 'daily_tasks')])
     return jsonify({'success': True})
 
 
 @app.route('/api/character/<int:char_id>/config', methods=['POST'])
+@roster_transaction
 def update_character_config(char_id):
     """Update character configuration (realm, name)."""
     data = load_data()
@@ -984,11 +3498,12 @@ def update_character_config(char_id):
     if 'character_name' in updates:
         char['character_name'] = updates['character_name']
 
-    save_data(data)
+    save_data(data, [(char_id, 'name'), (char_id, 'realm'), (char_id, 'character_name')])
     return jsonify({'success': True, 'character': char})
 
 
 @app.route('/api/blizzard/config', methods=['POST'])
+@roster_transaction
 def update_blizzard_config():
     """Save Blizzard API credentials."""
     data = load_data()
@@ -1003,14 +3518,16 @@ def update_blizzard_config():
     if 'region' in updates:
         data['blizzard_config']['region'] = updates['region']
 
-    # Clear cached token when credentials change
-    data['blizzard_config']['access_token'] = ''
-    data['blizzard_config']['token_expires'] = None
-
-    save_data(data)
+    save_data(data, [(None, 'blizzard_config')])
     return jsonify({'success': True})
 
 
+def sync_forced():
+    """Whether a sync request bypasses change detection (?force=1 or {"force": true})."""
+    body = request.get_json(silent=True) or {}
+    return request.args.get('force', '').lower() in ('1', 'true') or bool(body.get('force'))
+
+
 @app.route('/api/character/<int:char_id>/sync', methods=['POST'])
 def sync_character(char_id):
     """Sync character gear, avatar, and stats from Blizzard API."""
@@ -1026,127 +3543,96 @@ def sync_character(char_id):
 
         config = data['blizzard_config']
 
-        # Fetch equipment
-        api_data, error = fetch_character_equipment(config, char['realm'], char['character_name'])
+        # Network calls run without the roster lock so other requests aren't blocked
+        force = sync_forced()
+        payload, error = fetch_character_sync(config, char['realm'], char['character_name'],
+                                              char.get('sync_validators'), character_activity(char), force)
 
         if error:
             if '429' in str(error):
                 return jsonify({'error': 'Rate limit reached. Consider adding your own API key in Settings for higher limits.'}), 429
             return jsonify({'error': error}), 400
 
-        # Parse and update gear (preserves Track values)
-        char['gear'], api_avg_ilvl = parse_equipment_response(api_data, char['gear'])
+        with roster_write():
+            # Pick the character up again: the roster may have changed while we were fetching
+            data = load_data()
+            char = get_character(data, char_id)
+            if not char:
+                return jsonify({'error': 'Character not found'}), 404
 
-        # Use API's calculated ilvl if available, otherwise calculate manually
-        if api_avg_ilvl is not None:
-            char['avg_ilvl'] = round(api_avg_ilvl, 1)
-        else:
-            char['avg_ilvl'] = calculate_avg_ilvl(char['gear'])
-
-        # Fetch character profile (class, level)
-        profile_data, _ = fetch_character_profile(config, char['realm'], char['character_name'])
-        if profile_data:
-            char['class'] = profile_data.get('class', '')
-            char['level'] = profile_data.get('level', 0)
+            apply_character_sync(char, payload)
 
-        # Fetch character media (avatar)
-        avatar_url, _ = fetch_character_media(config, char['realm'], char['character_name'])
-        if avatar_url:
-            char['avatar_url'] = avatar_url
+            save_data(data, [(char_id, None)])
 
-        # Fetch character stats
-        stats_data, _ = fetch_character_stats(config, char['realm'], char['character_name'])
-        if stats_data:
-            char['stats'] = parse_character_stats(stats_data)
-
-        char['last_gear_sync'] = datetime.now(timezone.utc).isoformat().replace('+00:00', 'Z')
-
-        # BiS auto-check: mark matching items as obtained
-        synced_item_ids = set()
-        for slot_data in char['gear'].values():
-            iid = slot_data.get('item_id')
-            if iid:
-                synced_item_ids.add(int(iid))
-        for bis_item in char.get('bis_list', []):
-            if bis_item.get('item_id') and int(bis_item['item_id']) in synced_item_ids:
-                bis_item['obtained'] = True
-                bis_item['synced'] = True
-
-        # Save updated token if refreshed
-        save_data(data)
-
-        return jsonify({'success': True, 'character': char})
+            return jsonify({'success': True, 'character': char, 'unchanged': payload['unchanged']})
     except Exception as e:
+        # Swallowed, so teardown won't see it: drop a possibly half-synced character
+        invalidate_data_cache()
         return jsonify({'error': f'Sync failed: {str(e)}'}), 500
 
 
 @app.route('/api/sync-all', methods=['POST'])
 def sync_all_characters():
-    """Sync all characters from Blizzard API."""
-    data = load_data()
-    config = data['blizzard_config']
+    """Start syncing all characters from Blizzard API; progress is streamed from the job's events route."""
+    with roster_lock():
+        targets = [sync_target(char) for char in load_data()['characters']]
+
+    job = start_sync_job(current_roster().id, targets, sync_forced())
+    return jsonify({'success': True, 'job_id': job.id, 'total': len(targets)}), 202
+
+
+@app.route('/api/sync-jobs/<job_id>', methods=['GET'])
+def get_sync_job_status(job_id):
+    """State and results so far of a sync job."""
+    job = get_sync_job(job_id)
+    if not job or job.roster_id != current_roster().id:
+        return jsonify({'error': 'Sync job not found'}), 404
+    with job.changed:
+        return jsonify({'success': True, **job.summary()})
+
+
+@app.route('/api/sync-jobs/<job_id>/cancel', methods=['POST'])
+def cancel_sync_job(job_id):
+    """Stop a sync job; characters already fetched are kept, the rest are skipped."""
+    job = get_sync_job(job_id)
+    if not job or job.roster_id != current_roster().id:
+        return jsonify({'error': 'Sync job not found'}), 404
+    job.cancelled.set()
+    return jsonify({'success': True})
 
-    results = []
-    for char in data['characters']:
-        try:
-            if char.get('realm') and char.get('character_name'):
-                # Fetch equipment
-                api_data, error = fetch_character_equipment(config, char['realm'], char['character_name'])
-
-                if error:
-                    if '429' in str(error):
-                        results.append({'id': char['id'], 'name': char['name'], 'success': False, 'error': 'Rate limit reached. Consider adding your own API key in Settings for higher limits.'})
-                    else:
-                        results.append({'id': char['id'], 'name': char['name'], 'success': False, 'error': error})
-                else:
-                    char['gear'], api_avg_ilvl = parse_equipment_response(api_data, char['gear'])
-
-                    # Use API's calculated ilvl if available, otherwise calculate manually
-                    if api_avg_ilvl is not None:
-                        char['avg_ilvl'] = round(api_avg_ilvl, 1)
-                    else:
-                        char['avg_ilvl'] = calculate_avg_ilvl(char['gear'])
-
-                    # Fetch profile (class, level)
-                    profile_data, _ = fetch_character_profile(config, char['realm'], char['character_name'])
-                    if profile_data:
-                        char['class'] = profile_data.get('class', '')
-                        char['level'] = profile_data.get('level', 0)
-
-                    # Fetch avatar
-                    avatar_url, _ = fetch_character_media(config, char['realm'], char['character_name'])
-                    if avatar_url:
-                        char['avatar_url'] = avatar_url
-
-                    # Fetch stats
-                    stats_data, _ = fetch_character_stats(config, char['realm'], char['character_name'])
-                    if stats_data:
-                        char['stats'] = parse_character_stats(stats_data)
-
-                    char['last_gear_sync'] = datetime.now(timezone.utc).isoformat().replace('+00:00', 'Z')
-
-                    # BiS auto-check: mark matching items as obtained
-                    synced_item_ids = set()
-                    for slot_data in char['gear'].values():
-                        iid = slot_data.get('item_id')
-                        if iid:
-                            synced_item_ids.add(int(iid))
-                    for bis_item in char.get('bis_list', []):
-                        if bis_item.get('item_id') and int(bis_item['item_id']) in synced_item_ids:
-                            bis_item['obtained'] = True
-                            bis_item['synced'] = True
-
-                    results.append({'id': char['id'], 'name': char['name'], 'success': True})
-            else:
-                results.append({'id': char['id'], 'name': char['name'], 'success': False, 'error': 'Not configured'})
-        except Exception as e:
-            results.append({'id': char['id'], 'name': char['name'], 'success': False, 'error': f'Sync error: {str(e)}'})
 
-    save_data(data)
-    return jsonify({'success': True, 'results': results})
+@app.route('/api/sync-jobs/<job_id>/events', methods=['GET'])
+def stream_sync_job(job_id):
+    """Server-Sent Events: one 'result' per character as it completes, then 'done' with the summary."""
+    job = get_sync_job(job_id)
+    if not job or job.roster_id != current_roster().id:
+        return jsonify({'error': 'Sync job not found'}), 404
+
+    def events():
+        sent = 0
+        while True:
+            with job.changed:
+                if sent == len(job.results) and job.finished is None:
+                    job.changed.wait(timeout=15)
+                pending = job.results[sent:]
+                finished = job.finished is not None and sent + len(pending) == len(job.results)
+                summary = job.summary() if finished else None
+
+            if not pending and not finished:
+                yield ': keepalive\n\n'
+            for result in pending:
+                yield f'event: result\ndata: {json.dumps(result)}\n\n'
+            sent += len(pending)
+            if finished:
+                yield f'event: done\ndata: {json.dumps(summary)}\n\n'
+                return
+
+    return Response(events(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
 
 
 @app.route('/api/reset-daily', methods=['POST'])
+@roster_transaction
 def reset_daily():
     """Reset daily tasks for all characters."""
     data = load_data()
@@ -1154,11 +3640,12 @@ def reset_daily():
     for char in data['characters']:
         char['daily_tasks'] = {}
 
-    save_data(data)
+    save_data(data, [(char['id'], 'daily_tasks') for char in data['characters']])
     return jsonify({'success': True})
 
 
 @app.route('/api/characters', methods=['POST'])
+@roster_transaction
 def add_character():
     """Add a new character."""
     data = load_data()
@@ -1213,24 +3700,27 @@ def add_character():
     }
 
     data['characters'].append(new_char)
-    save_data(data)
+    save_data(data, [(new_id, None)])
 
     return jsonify({'success': True, 'character': new_char})
 
 
 @app.route('/api/characters/<int:char_id>', methods=['DELETE'])
+@roster_transaction
 def delete_character(char_id):
     """Delete a character."""
     data = load_data()
 
     # Find and remove character
     data['characters'] = [char for char in data['characters'] if char['id'] != char_id]
+    current_roster().archive.delete(char_id)
 
-    save_data(data)
+    save_data(data, [(char_id, None)])
     return jsonify({'success': True})
 
 
 @app.route('/api/characters/reorder', methods=['POST'])
+@roster_transaction
 def reorder_characters():
     """Update character display order."""
     data = load_data()
@@ -1244,11 +3734,15 @@ def reorder_characters():
         if char['id'] in order_map:
             char['order'] = order_map[char['id']]
 
-    save_data(data)
+    # Keep the cached roster in display order (load_data no longer re-sorts)
+    data['characters'].sort(key=lambda c: c.get('order', c['id']))
+
+    save_data(data, [(char['id'], 'order') for char in data['characters']])
     return jsonify({'success': True})
 
 
 @app.route('/api/characters/<int:char_id>/professions', methods=['PUT'])
+@roster_transaction
 def update_character_professions(char_id):
     """Update professions for a character."""
     data = load_data()
@@ -1284,7 +3778,7 @@ def update_character_professions(char_id):
         if prof not in new_professions:
             del char['profession_progress'][prof]
 
-    save_data(data)
+    save_data(data, [(char_id, 'professions'), (char_id, 'profession_progress')])
 
     return jsonify({'success': True, 'character': char})
 
@@ -1296,7 +3790,7 @@ def get_item_icon(item_id):
         data = load_data()
         config = data['blizzard_config']
 
-        icon_url = fetch_item_media(config, item_id)
+        icon_url = get_item_icon_url(config, item_id)
 
         if icon_url:
             return jsonify({'success': True, 'icon_url': icon_url})
@@ -1306,7 +3800,71 @@ def get_item_icon(item_id):
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
+def send_stored_image(digest, content_type):
+    """Serve a stored image; its URL names its content, so it can be cached forever."""
+    response = send_file(image_store.path(digest), mimetype=content_type, etag=digest,
+                         max_age=365 * 86400, conditional=True)
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+
+@app.route('/api/images/<digest>', methods=['GET'])
+def get_stored_image(digest):
+    """Serve an image by content digest (character avatars)."""
+    content_type = image_store.content_type(digest) if re.fullmatch(r'[0-9a-f]{64}', digest) else None
+    if not content_type or not os.path.exists(image_store.path(digest)):
+        return jsonify({'error': 'Image not found'}), 404
+    return send_stored_image(digest, content_type)
+
+
+@app.route('/api/image', methods=['GET'])
+def proxy_image():
+    """Serve a remote icon or avatar from the local store, downloading it the first time."""
+    url = request.args.get('url', '')
+    if not image_store.allowed(url):
+        return jsonify({'error': 'Image host not allowed'}), 400
+
+    stored = image_store.fetch(url)
+    if not stored:
+        return jsonify({'error': 'Image unavailable'}), 502
+    return send_stored_image(*stored)
+
+
+@app.route('/api/items/icons', methods=['POST'])
+def get_item_icons():
+    """Batch icon lookup: cached items are answered directly, misses are fetched concurrently."""
+    item_ids = (request.json or {}).get('item_ids', [])
+    if not isinstance(item_ids, list) or len(item_ids) > ICON_BATCH_MAX:
+        return jsonify({'success': False, 'error': f'item_ids must be a list of at most {ICON_BATCH_MAX} ids'}), 400
+    try:
+        item_ids = sorted({int(item_id) for item_id in item_ids})
+    except (TypeError, ValueError):
+        return jsonify({'success': False, 'error': 'item_ids must be integers'}), 400
+
+    try:
+        icons = {}
+        misses = []
+        for item_id in item_ids:
+            hit, icon_url = item_media_cache.get(item_id)
+            if hit:
+                icons[str(item_id)] = icon_url
+            else:
+                misses.append(item_id)
+
+        if misses:
+            config = load_data()['blizzard_config']
+            with ThreadPoolExecutor(max_workers=ICON_BATCH_CONCURRENCY) as pool:
+                icon_urls = pool.map(lambda item_id: get_item_icon_url(config, item_id), misses)
+                icons.update({str(item_id): icon_url for item_id, icon_url in zip(misses, icon_urls)})
+
+        return jsonify({'success': True, 'icons': icons})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
 @app.route('/api/character/<int:char_id>/weekly-progress', methods=['POST'])
+@roster_transaction
 def update_weekly_progress(char_id):
     """Update weekly progress (raid, M+, delve, world vault)."""
     data = load_data()
@@ -1339,11 +3897,38 @@ def update_weekly_progress(char_id):
     if 'world_vault' in updates:
         wp['world_vault'] = updates['world_vault'][:3]
 
-    save_data(data)
+    save_data(data, [(char_id, 'weekly_progress')])
     return jsonify({'success': True, 'weekly_progress': char['weekly_progress']})
 
 
+@app.route('/api/character/<int:char_id>', methods=['GET'])
+def get_character_data(char_id):
+    """One character, optionally trimmed with ?fields= like /api/data."""
+    fields = parse_fields(request.args.get('fields'))
+    with roster_lock():
+        data = load_data()
+        char = get_character(data, char_id)
+        if not char:
+            return jsonify({'error': 'Character not found'}), 404
+
+        char['avg_ilvl'] = calculate_avg_ilvl(char['gear'])
+        return jsonify({'success': True, 'character': project_character(char, fields)})
+
+
+@app.route('/api/character/<int:char_id>/history', methods=['GET'])
+def get_character_history(char_id):
+    """Full per-week crest, task and progress history, including archived weeks."""
+    with roster_lock():
+        data = load_data()
+        char = get_character(data, char_id)
+        if not char:
+            return jsonify({'error': 'Character not found'}), 404
+
+        return jsonify({'success': True, 'history': merge_week_history(current_roster().archive, char)})
+
+
 @app.route('/api/character/<int:char_id>/bis', methods=['POST'])
+@roster_transaction
 def add_bis_item(char_id):
     """Add a BiS item to a character."""
     data = load_data()
@@ -1373,11 +3958,12 @@ def add_bis_item(char_id):
     }
 
     char['bis_list'].append(new_item)
-    save_data(data)
+    save_data(data, [(char_id, 'bis_list')])
     return jsonify({'success': True, 'item': new_item})
 
 
 @app.route('/api/character/<int:char_id>/bis/<int:bis_id>', methods=['PUT'])
+@roster_transaction
 def update_bis_item(char_id, bis_id):
     """Update a BiS item (toggle obtained, edit fields)."""
     data = load_data()
@@ -1401,11 +3987,12 @@ def update_bis_item(char_id, bis_id):
     if 'target_ilvl' in updates:
         bis_item['target_ilvl'] = int(updates['target_ilvl']) if updates['target_ilvl'] else None
 
-    save_data(data)
+    save_data(data, [(char_id, 'bis_list')])
     return jsonify({'success': True, 'item': bis_item})
 
 
 @app.route('/api/character/<int:char_id>/bis/<int:bis_id>', methods=['DELETE'])
+@roster_transaction
 def delete_bis_item(char_id, bis_id):
     """Delete a BiS item."""
     data = load_data()
@@ -1414,11 +4001,12 @@ def delete_bis_item(char_id, bis_id):
         return jsonify({'error': 'Character not found'}), 404
 
     char['bis_list'] = [item for item in char.get('bis_list', []) if item['id'] != bis_id]
-    save_data(data)
+    save_data(data, [(char_id, 'bis_list')])
     return jsonify({'success': True})
 
 
 @app.route('/api/character/<int:char_id>/talents', methods=['POST'])
+@roster_transaction
 def add_talent_build(char_id):
     """Add a talent build to a character."""
     data = load_data()
@@ -1446,11 +4034,12 @@ def add_talent_build(char_id):
     }
 
     char['talent_builds'].append(new_build)
-    save_data(data)
+    save_data(data, [(char_id, 'talent_builds')])
     return jsonify({'success': True, 'build': new_build})
 
 
 @app.route('/api/character/<int:char_id>/talents/<int:talent_id>', methods=['PUT'])
+@roster_transaction
 def update_talent_build(char_id, talent_id):
     """Update a talent build."""
     data = load_data()
@@ -1472,11 +4061,12 @@ def update_talent_build(char_id, talent_id):
     if 'category' in updates:
         build['category'] = updates['category']
 
-    save_data(data)
+    save_data(data, [(char_id, 'talent_builds')])
     return jsonify({'success': True, 'build': build})
 
 
 @app.route('/api/character/<int:char_id>/talents/<int:talent_id>', methods=['DELETE'])
+@roster_transaction
 def delete_talent_build(char_id, talent_id):
     """Delete a talent build."""
     data = load_data()
@@ -1485,7 +4075,7 @@ def delete_talent_build(char_id, talent_id):
         return jsonify({'error': 'Character not found'}), 404
 
     char['talent_builds'] = [b for b in char.get('talent_builds', []) if b['id'] != talent_id]
-    save_data(data)
+    save_data(data, [(char_id, 'talent_builds')])
     return jsonify({'success': True})
 
 
@@ -1518,6 +4108,178 @@ def debug_character_stats(char_id):
         return jsonify({'error': f'Debug failed: {str(e)}'}), 500
 
 
+@app.route('/api/scheduler', methods=['GET'])
+def get_scheduler_status():
+    """Background sync scheduler state for this roster: queue, budget use, recent results."""
+    return jsonify({'success': True, 'scheduler': sync_scheduler.status(current_roster().id)})
+
+
+@app.route('/api/scheduler/boost/<int:char_id>', methods=['POST'])
+def boost_character_sync(char_id):
+    """Ask the scheduler to sync a character next."""
+    with roster_lock():
+        if not get_character(load_data(), char_id):
+            return jsonify({'error': 'Character not found'}), 404
+
+    sync_scheduler.boost(current_roster().id, char_id)
+    return jsonify({'success': True})
+
+
+@app.route('/api/events', methods=['GET'])
+def stream_changes():
+    """Server-Sent Events: one 'change' per (character, section) a save commits.
+
+    Payloads are {char_id, section, value}, {char_id, deleted: true} for a
+    removed character, or char_id null for roster-level keys; 'reload' means
+    the client should fetch /api/data again.
+    """
+    roster = current_roster()
+    feed = roster.feed
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('since')
+    try:
+        after = int(last_event_id)
+    except (TypeError, ValueError):
+        after = feed.seq
+
+    def events(after):
+        yield 'retry: 3000\n\n'
+        while True:
+            batch = feed.wait(after, timeout=15)
+            if not batch:
+                # Quiet for a while: check for changes made outside this process
+                # (load() publishes a reload if storage moved underneath it)
+                try:
+                    roster.load()
+                except Exception as e:
+                    print(f"Change feed: reload check failed for roster {roster.id}: {e}", file=sys.stderr)
+                yield ': keepalive\n\n'
+            for seq, event, payload in batch:
+                yield f'id: {seq}\nevent: {event}\ndata: {payload}\n\n'
+                after = seq
+
+    return Response(events(after), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+@app.route('/api/snapshots', methods=['GET'])
+def list_snapshots():
+    """List stored roster snapshots, newest first."""
+    with roster_lock():
+        manifests = current_roster().snapshots.list()
+
+    return jsonify({'success': True, 'snapshots': [{
+        'id': m['id'],
+        'created': m['created'],
+        'label': m.get('label'),
+        'character_count': len(m['characters']),
+        'new_bytes': m.get('new_bytes', 0),
+    } for m in manifests]})
+
+
+@app.route('/api/snapshots', methods=['POST'])
+def create_snapshot():
+    """Take a snapshot now. Labelled snapshots are exempt from retention."""
+    label = (request.json or {}).get('label') if request.is_json else None
+
+    with roster_lock(exclusive=True):
+        manifest = current_roster().snapshots.create(load_data(), label=label)
+
+    return jsonify({'success': True, 'snapshot': {k: v for k, v in manifest.items()
+                                                  if k not in ('characters', 'archives')}})
+
+
+@app.route('/api/snapshots/<snapshot_id>/restore', methods=['POST'])
+@roster_transaction
+def restore_snapshot(snapshot_id):
+    """Replace the roster with a snapshot, snapshotting the current state first."""
+    snapshots = current_roster().snapshots
+    manifest = snapshots.get(snapshot_id)
+    if not manifest:
+        return jsonify({'error': 'Snapshot not found'}), 404
+
+    snapshots.create(load_data(), label=f'Before restoring {snapshot_id}')
+
+    data = snapshots.load(manifest)
+    data['characters'].sort(key=lambda c: c.get('order', c['id']))
+    apply_migrations(data)
+    snapshots.restore_archives(manifest, data)
+    save_data(data)
+    return jsonify({'success': True, 'restored': snapshot_id})
+
+
+@app.route('/api/snapshots/<snapshot_id>', methods=['DELETE'])
+def delete_snapshot(snapshot_id):
+    """Delete a snapshot; chunks only it referenced are reclaimed."""
+    snapshots = current_roster().snapshots
+    with roster_lock(exclusive=True):
+        if not snapshots.get(snapshot_id):
+            return jsonify({'error': 'Snapshot not found'}), 404
+        snapshots.delete(snapshot_id)
+
+    return jsonify({'success': True})
+
+
+@app.route('/api/rosters', methods=['GET'])
+def list_rosters():
+    """List rosters with their per-shard summaries."""
+    return jsonify({'success': True, 'rosters': [get_roster(rid).read_summary() for rid in list_roster_ids()]})
+
+
+@app.route('/api/rosters', methods=['POST'])
+def create_roster():
+    """Create a new, empty roster shard."""
+    req_data = request.json
+    roster_id = str(req_data.get('id', '')).strip().lower()
+
+    if not ROSTER_ID_PATTERN.match(roster_id) or roster_id == DEFAULT_ROSTER_ID:
+        return jsonify({'success': False, 'error': 'Roster ID must be lowercase letters, digits, - or _'}), 400
+    if get_roster(roster_id) is not None:
+        return jsonify({'success': False, 'error': 'Roster already exists'}), 409
+
+    roster = get_roster(roster_id, create=True)
+    with roster.locked(exclusive=True):
+        data = roster.load()
+        data['meta']['roster_name'] = req_data.get('name') or roster_id
+        roster.write(data, [(None, 'meta')])
+
+    return jsonify({'success': True, 'roster': roster.read_summary()})
+
+
+@app.route('/api/rosters/summary', methods=['GET'])
+def get_rosters_summary():
+    """Guild-wide view built from per-shard summaries, without loading any roster in full."""
+    summaries = [get_roster(rid).read_summary() for rid in list_roster_ids()]
+
+    characters = [dict(char, roster_id=summary['id']) for summary in summaries for char in summary['characters']]
+    characters.sort(key=lambda c: c['avg_ilvl'], reverse=True)
+
+    class_counts = {}
+    for char in characters:
+        class_counts[char['class'] or 'Unknown'] = class_counts.get(char['class'] or 'Unknown', 0) + 1
+
+    return jsonify({
+        'success': True,
+        'roster_count': len(summaries),
+        'character_count': len(characters),
+        'avg_ilvl': round(sum(c['avg_ilvl'] for c in characters) / len(characters), 1) if characters else 0,
+        'class_counts': class_counts,
+        'rosters': [{k: v for k, v in summary.items() if k != 'characters'} for summary in summaries],
+        'characters': characters,
+    })
+
+
+def register_roster_routes():
+    """Mirror every /api/... route under /api/rosters/<roster_id>/... for named rosters."""
+    for rule in list(app.url_map.iter_rules()):
+        if rule.rule.startswith('/api/') and not rule.rule.startswith('/api/rosters'):
+            app.add_url_rule('/api/rosters/<roster_id>' + rule.rule[len('/api'):],
+                             endpoint=rule.endpoint, methods=sorted(rule.methods - {'HEAD', 'OPTIONS'}))
+
+
+# Keep this after the last /api route so every route gets its roster-scoped twin
+register_roster_routes()
+
+
 if __name__ == '__main__':
     # When packaged with PyInstaller, run without debug mode
     is_packaged = getattr(sys, 'frozen', False)
@@ -1526,6 +4288,9 @@ if __name__ == '__main__':
     print(f"Starting Hool.gg Roster (packaged={is_packaged}, debug={debug_mode})", file=sys.stderr)
     print(f"Data directory: {_data_dir}", file=sys.stderr)
 
+    if AUTO_SYNC_BUDGET > 0:
+        sync_scheduler.start()
+
     try:
         app.run(debug=debug_mode, port=5000, use_reloader=False)
     except Exception as e:
@@ -103,6 +103,8 @@ function initWindowControls() {
 document.addEventListener('DOMContentLoaded', () => {
     initWindowControls();
     loadData().then(() => {
+        subscribeToChanges();
+
         // Start tour on first visit
         if (!localStorage.getItem('tourCompleted')) {
             setTimeout(startTour, 1000); // Delay to let UI settle
@@ -125,11 +127,106 @@ async function loadData() {
     }
 }
 
+// Live updates: the server pushes every committed change over /api/events
+// and we patch appData in place instead of re-fetching /api/data
+let changeStream = null;
+let renderPending = false;
+
+function subscribeToChanges() {
+    if (!window.EventSource) return;
+    changeStream = new EventSource('/api/events');
+    changeStream.addEventListener('change', (event) => applyServerChange(JSON.parse(event.data)));
+    changeStream.addEventListener('reload', () => loadData());
+}
+
+function applyServerChange(change) {
+    if (!appData) return;
+
+    if (change.char_id === null) {
+        // Meta changes affect server-computed fields (week, targets, tasks)
+        if (change.section === 'meta') {
+            loadData();
+            return;
+        }
+        appData[change.section] = change.value;
+    } else if (change.deleted) {
+        appData.characters = appData.characters.filter(c => c.id !== change.char_id);
+    } else {
+        const index = appData.characters.findIndex(c => c.id === change.char_id);
+        if (change.section === null) {
+            if (index === -1) appData.characters.push(change.value);
+            else appData.characters[index] = change.value;
+        } else if (index !== -1) {
+            appData.characters[index][change.section] = change.value;
+        }
+        if (change.section === 'order') {
+            appData.characters.sort((a, b) => (a.order ?? a.id) - (b.order ?? b.id));
+        }
+    }
+    scheduleRender();
+}
+
+function scheduleRender() {
+    if (renderPending) return;
+    renderPending = true;
+    setTimeout(() => {
+        renderPending = false;
+        renderAll();
+        loadItemIcons();
+    }, 50);
+}
+
+// After a save: the change stream patches appData, so only reload without it
+async function refreshAfterChange() {
+    if (changeStream && changeStream.readyState === EventSource.OPEN) return;
+    await loadData();
+}
+
+// Remote images go through the server's local image store
+function localImageUrl(url) {
+    return /^https:\/\//.test(url) ? `/api/image?url=${encodeURIComponent(url)}` : url;
+}
+
+function avatarImageUrl(char, size) {
+    if (char.avatar_image) return `/api/images/${char.avatar_image}`;
+    if (char.avatar_url) return localImageUrl(char.avatar_url);
+    return `data:image/svg+xml,%3Csvg xmlns="http://www.w3.org/2000/svg" width="${size}" height="${size}"%3E%3Crect fill="%232a2a2a"/%3E%3C/svg%3E`;
+}
+
+// Icon lookups in flight, keyed by item id, so overlapping loadItemIcons()
+// runs share requests
+const pendingIconRequests = new Map();
+
+// Resolve icon URLs for many items with one POST /api/items/icons.
+// Returns a promise of {itemId: iconUrl or null}.
+function fetchItemIcons(itemIds) {
+    const missing = itemIds.filter(id => !pendingIconRequests.has(id));
+    if (missing.length > 0) {
+        const batch = fetch('/api/items/icons', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ item_ids: missing.map(Number) })
+        })
+            .then(response => response.json())
+            .then(result => result.success ? result.icons : {})
+            .catch(() => ({}));
+
+        for (const id of missing) {
+            pendingIconRequests.set(id, batch
+                .then(icons => icons[id] || null)
+                .finally(() => pendingIconRequests.delete(id)));
+        }
+    }
+
+    return Promise.all(itemIds.map(id => pendingIconRequests.get(id).then(url => [id, url])))
+        .then(entries => Object.fromEntries(entries));
+}
+
 // Load item icons dynamically from Blizzard API with caching
 async function loadItemIcons() {
     const iconElements = document.querySelectorAll('.gear-item-icon[data-item-id]');
     const iconCache = JSON.parse(localStorage.getItem('itemIconCache') || '{}');
-    let cacheUpdated = false;
+    const uncached = [];
 
     for (const img of iconElements) {
         const itemId = img.dataset.itemId;
@@ -137,41 +234,34 @@ async function loadItemIcons() {
 
         // Check cache first
         if (iconCache[itemId]) {
-            img.src = iconCache[itemId];
+            img.src = localImageUrl(iconCache[itemId]);
             img.style.display = 'block';
             continue;
         }
+        uncached.push(img);
+    }
 
-        // Fetch from API if not cached
-        try {
-            const response = await fetch(`/api/item/${itemId}/icon`);
-            const result = await response.json();
+    if (uncached.length === 0) return;
 
-            if (result.success && result.icon_url) {
-                img.src = result.icon_url;
-                img.style.display = 'block';
-                iconCache[itemId] = result.icon_url;
-                cacheUpdated = true;
-            } else {
-                // Try Wowhead fallback
-                const fallbackUrl = `https://wow.zamimg.com/images/wow/icons/medium/${itemId}.jpg`;
-                img.src = fallbackUrl;
-                iconCache[itemId] = fallbackUrl;
-                cacheUpdated = true;
-            }
-        } catch (error) {
-            // Try Wowhead fallback on error
+    // Fetch every missing icon in one request, falling back to Wowhead
+    const itemIds = [...new Set(uncached.map(img => img.dataset.itemId))];
+    const icons = await fetchItemIcons(itemIds);
+
+    for (const img of uncached) {
+        const itemId = img.dataset.itemId;
+        if (icons[itemId]) {
+            img.src = localImageUrl(icons[itemId]);
+            img.style.display = 'block';
+            iconCache[itemId] = icons[itemId];
+        } else {
             const fallbackUrl = `https://wow.zamimg.com/images/wow/icons/medium/${itemId}.jpg`;
-            img.src = fallbackUrl;
+            img.src = localImageUrl(fallbackUrl);
             iconCache[itemId] = fallbackUrl;
-            cacheUpdated = true;
         }
     }
 
     // Save updated cache to localStorage
-    if (cacheUpdated) {
-        localStorage.setItem('itemIconCache', JSON.stringify(iconCache));
-    }
+    localStorage.setItem('itemIconCache', JSON.stringify(iconCache));
 }
 
 // Setup tab switching
@@ -701,7 +791,7 @@ function createCompactCard(char) {
     const delta = char.avg_ilvl - appData.weekly_target;
     const deltaClass = delta >= 0 ? 'positive' : 'negative';
     const deltaSign = delta >= 0 ? '+' : '';
-    const avatarUrl = char.avatar_url || 'data:image/svg+xml,%3Csvg xmlns="http://www.w3.org/2000/svg" width="48" height="48"%3E%3Crect fill="%232a2a2a"/%3E%3C/svg%3E';
+    const avatarUrl = avatarImageUrl(char, 48);
     const classColor = getClassColor(char.class);
 
     // Task counts
@@ -789,7 +879,7 @@ function renderDetailView(container, char) {
     const delta = char.avg_ilvl - appData.weekly_target;
     const deltaClass = delta >= 0 ? 'positive' : 'negative';
     const deltaSign = delta >= 0 ? '+' : '';
-    const avatarUrl = char.avatar_url || 'data:image/svg+xml,%3Csvg xmlns="http://www.w3.org/2000/svg" width="80" height="80"%3E%3Crect fill="%232a2a2a"/%3E%3C/svg%3E';
+    const avatarUrl = avatarImageUrl(char, 80);
     const classColor = getClassColor(char.class);
 
     container.innerHTML = `
@@ -911,7 +1001,7 @@ function renderDetailTimeline(char, currentWeek) {
         node.addEventListener('click', async () => {
             const newWeek = parseInt(node.dataset.week);
             await saveData('/api/meta', { current_week: newWeek });
-            await loadData();
+            await refreshAfterChange();
         });
     });
 }
@@ -963,7 +1053,7 @@ function renderBisTracker(char) {
             const bisItem = e.target.closest('.bis-item');
             const bisId = parseInt(bisItem.dataset.bisId);
             await saveData(`/api/character/${char.id}/bis/${bisId}`, { obtained: e.target.checked }, 'PUT');
-            await loadData();
+            await refreshAfterChange();
         });
     });
 
@@ -972,7 +1062,7 @@ function renderBisTracker(char) {
             const bisId = parseInt(e.currentTarget.dataset.bisId);
             try {
                 await fetch(`/api/character/${char.id}/bis/${bisId}`, { method: 'DELETE' });
-                await loadData();
+                await refreshAfterChange();
             } catch(err) { showSaveIndicator('Delete failed', 'error'); }
         });
     });
@@ -992,7 +1082,7 @@ function renderBisTracker(char) {
                 body: JSON.stringify({ slot, item_name: name, item_id: itemId || null, target_ilvl: targetIlvl || null })
             });
             const result = await response.json();
-            if (result.success) { showSaveIndicator('BiS item added', 'saved'); await loadData(); }
+            if (result.success) { showSaveIndicator('BiS item added', 'saved'); await refreshAfterChange(); }
             else { showSaveIndicator(result.error || 'Failed', 'error'); }
         } catch(err) { showSaveIndicator('Failed to add BiS item', 'error'); }
     });
@@ -1044,7 +1134,7 @@ function renderTalentBuilds(char) {
             const talentId = parseInt(btn.dataset.talentId);
             try {
                 await fetch(`/api/character/${char.id}/talents/${talentId}`, { method: 'DELETE' });
-                await loadData();
+                await refreshAfterChange();
             } catch(err) { showSaveIndicator('Delete failed', 'error'); }
         });
     });
@@ -1080,7 +1170,7 @@ function renderTalentBuilds(char) {
                 body: JSON.stringify({ category, name, description, talent_string: talentString })
             });
             const result = await response.json();
-            if (result.success) { showSaveIndicator('Talent build saved', 'saved'); await loadData(); }
+            if (result.success) { showSaveIndicator('Talent build saved', 'saved'); await refreshAfterChange(); }
             else { showSaveIndicator(result.error || 'Failed', 'error'); }
         } catch(err) { showSaveIndicator('Failed to save talent build', 'error'); }
     });
@@ -1131,7 +1221,7 @@ function renderDetailCrests(char) {
             const crestType = e.target.dataset.crestType;
             const value = parseInt(e.target.value) || 0;
             await saveData(`/api/character/${charId}/crests`, { crest_type: crestType, collected_this_week: value });
-            await loadData();
+            await refreshAfterChange();
         });
     });
 }
@@ -1199,7 +1289,7 @@ function renderDetailProfessions(char) {
                     body: JSON.stringify({ professions: newProfessions })
                 });
                 const result = await response.json();
-                if (result.success) { showSaveIndicator('Profession updated', 'saved'); await loadData(); }
+                if (result.success) { showSaveIndicator('Profession updated', 'saved'); await refreshAfterChange(); }
                 else { showSaveIndicator('Failed to update profession', 'error'); }
             } catch(err) { showSaveIndicator('Failed to update profession', 'error'); }
         });
@@ -1292,7 +1382,7 @@ function renderWeeklyProgress(char, currentWeek) {
                 body: JSON.stringify({ raid_bosses: raidBosses, m_plus_dungeons: mplusDungeons, highest_delve: highestDelve, world_vault: worldVault })
             });
             const result = await response.json();
-            if (result.success) { showSaveIndicator('Progress saved', 'saved'); await loadData(); }
+            if (result.success) { showSaveIndicator('Progress saved', 'saved'); await refreshAfterChange(); }
             else { showSaveIndicator(result.error || 'Failed', 'error'); }
         } catch(err) { showSaveIndicator('Failed to save progress', 'error'); }
     });
@@ -1702,7 +1792,7 @@ async function addCharacter() {
             const result = await response.json();
             if (result.success) {
                 showSaveIndicator('Character added', 'saved');
-                await loadData();
+                await refreshAfterChange();
             } else {
                 showSaveIndicator('Failed to add character', 'error');
             }
@@ -1766,7 +1856,7 @@ async function deleteCharacter(charId) {
         if (result.success) {
             showSaveIndicator('Character deleted', 'saved');
             navigateToOverview();
-            await loadData();
+            await refreshAfterChange();
         } else {
             showSaveIndicator('Failed to delete character', 'error');
         }
@@ -1825,7 +1915,7 @@ async function syncCharacter(charId, btn) {
 
         if (result.success) {
             showSaveIndicator('Gear synced', 'saved');
-            await loadData();
+            await refreshAfterChange();
             // Scroll to top so user sees updated header ilvl and gear
             document.querySelector('.detail-view, #dashboard')?.scrollIntoView({ behavior: 'smooth', block: 'start' });
             window.scrollTo({ top: 0, behavior: 'smooth' });
@@ -1848,23 +1938,59 @@ async function syncCharacter(charId, btn) {
 async function syncAllCharacters() {
     try {
         const response = await fetch('/api/sync-all', { method: 'POST' });
-        const result = await response.json();
-
-        const successCount = result.results.filter(r => r.success).length;
-        const total = result.results.length;
-        showSaveIndicator(`Synced ${successCount}/${total} characters`, 'saved');
+        const job = await response.json();
+        if (!job.success) throw new Error(job.error);
+
+        // Progress arrives per character as the server finishes each one
+        showSaveIndicator(`Syncing 0/${job.total} characters...`, 'saving');
+
+        const summary = await new Promise((resolve, reject) => {
+            const seen = new Set();
+            const events = new EventSource(`/api/sync-jobs/${job.job_id}/events`);
+            events.addEventListener('result', (event) => {
+                const result = JSON.parse(event.data);
+                // A reconnected stream replays the results sent before
+                if (seen.has(result.id)) return;
+                seen.add(result.id);
+                showSaveIndicator(`Syncing ${seen.size}/${job.total}: ${result.name}`, 'saving');
+            });
+            events.addEventListener('done', (event) => {
+                events.close();
+                resolve(JSON.parse(event.data));
+            });
+            events.onerror = () => {
+                // EventSource reconnects on its own; poll only once it has given up
+                if (events.readyState !== EventSource.CLOSED) return;
+                pollSyncJob(job.job_id).then(resolve, reject);
+            };
+        });
 
-        await loadData();
+        await refreshAfterChange();
+        if (summary.state === 'failed') throw new Error(summary.error);
+        showSaveIndicator(`Synced ${summary.succeeded}/${summary.total} characters`, 'saved');
     } catch (error) {
         showSaveIndicator('Sync all failed', 'error');
     }
 }
 
+// Wait for a sync job by polling its status (when its event stream can't reconnect)
+async function pollSyncJob(jobId) {
+    while (true) {
+        const response = await fetch(`/api/sync-jobs/${jobId}`);
+        const status = await response.json();
+        if (!status.success) throw new Error(status.error);
+        if (status.state !== 'running') return status;
+
+        showSaveIndicator(`Syncing ${status.completed}/${status.total} characters...`, 'saving');
+        await new Promise(resolve => setTimeout(resolve, 2000));
+    }
+}
+
 async function resetDaily() {
     if (!confirm('Reset all daily checklists?')) return;
 
     await saveData('/api/reset-daily', {});
-    await loadData();
+    await refreshAfterChange();
     showSaveIndicator('Daily checklists reset', 'saved');
 }
 